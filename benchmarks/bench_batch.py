@@ -0,0 +1,107 @@
+"""
+N single /chat calls vs. one /chat/batch call.
+
+Groq is replaced by the local stub server and the database by sleeps, and both
+count their calls, so the output shows round trips as well as wall time.
+
+    python -m benchmarks.bench_batch --messages 40 --distinct 25
+"""
+import argparse
+import json
+import os
+import time
+from datetime import date, datetime
+
+from benchmarks.stub_groq_server import start_stub_server
+
+ACADEMIES_PER_AREA = 8
+
+def install_db_stubs(db_latency, counter):
+    from services import search_service
+    from services.slot_grid import DayGrid
+    from services.academy_index import haversine_km
+
+    def fake_nearby(lat, lng, radius=60, limit=5):
+        # Each area (0.05 degree square) has its own academies, so different locations
+        # need different grids and the batch's shared per-date lookup shows up in db_calls.
+        counter["db"] += 1
+        time.sleep(db_latency)
+        area_lat, area_lng = round(lat * 20) / 20, round(lng * 20) / 20
+        centres = []
+        for i in range(ACADEMIES_PER_AREA):
+            a_lat, a_lng = area_lat + i * 0.002, area_lng + i * 0.002
+            distance = haversine_km(lat, lng, a_lat, a_lng)
+            if distance < radius:
+                centres.append({"post_title": f"Academy {area_lat:.2f},{area_lng:.2f} #{i}", "address": "-",
+                                "latitude": a_lat, "longitude": a_lng, "distance": distance})
+        centres.sort(key=lambda c: c["distance"])
+        return centres[:limit]
+
+    def fake_grids(names, date_str):
+        counter["db"] += 1
+        time.sleep(db_latency)
+        day = datetime.strptime(date_str, "%Y-%m-%d")
+        return {name: DayGrid(day) for name in names}
+
+    search_service.find_nearby_centres = fake_nearby
+    search_service.get_day_grids = fake_grids
+
+def reset_caches():
+    from llm_cache import intent_cache
+    from services.search_service import invalidate_all
+    if intent_cache is not None:
+        intent_cache.clear()
+    invalidate_all()
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=40)
+    parser.add_argument("--distinct", type=int, default=25, help="how many different messages (the rest repeat)")
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    parser.add_argument("--db-latency", type=float, default=0.02)
+    args = parser.parse_args()
+
+    today = date.today().strftime("%Y-%m-%d")
+    server, url = start_stub_server(delay=args.llm_latency, intent={"intent": "check_slots", "date": today})
+    calls = {"llm": 0}
+    handler = server.RequestHandlerClass
+    original = handler.do_POST
+    def counting_post(self):
+        calls["llm"] += 1
+        original(self)
+    handler.do_POST = counting_post
+
+    # Force every message through the LLM path so the comparison is about round trips.
+    os.environ.update(GROQ_BASE_URL=url, GROQ_API_KEY="stub", INTENT_FAST_PATH="off")
+    from fastapi.testclient import TestClient
+    import main
+    counter = {"db": 0}
+    install_db_stubs(args.db_latency, counter)
+    client = TestClient(main.app)
+
+    lat, lng = 30.7570, 76.7800
+    items = [{"message": f"any openings near sector {i % args.distinct}?", "latitude": lat + (i % args.distinct) * 0.05,
+              "longitude": lng} for i in range(args.messages)]
+
+    results = {}
+    reset_caches()
+    calls["llm"], counter["db"] = 0, 0
+    started = time.perf_counter()
+    for item in items:
+        client.post("/chat", json=item).raise_for_status()
+    results["single"] = {"seconds": round(time.perf_counter() - started, 3), "llm_calls": calls["llm"], "db_calls": counter["db"]}
+
+    reset_caches()
+    calls["llm"], counter["db"] = 0, 0
+    started = time.perf_counter()
+    resp = client.post("/chat/batch", json={"requests": items})
+    resp.raise_for_status()
+    errors = sum(1 for r in resp.json()["results"] if "error" in r)
+    results["batch"] = {"seconds": round(time.perf_counter() - started, 3), "llm_calls": calls["llm"],
+                        "db_calls": counter["db"], "errors": errors}
+    results["speedup"] = round(results["single"]["seconds"] / results["batch"]["seconds"], 2)
+    print(json.dumps(results, indent=2))
+    server.shutdown()
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,78 @@
+"""
+Concurrent /chat throughput, blocking pipeline vs thread-offloaded pipeline.
+
+Groq and MySQL are replaced by sleeps of configurable latency, so this measures
+how well one worker's event loop overlaps requests, not backend speed.
+
+    python -m benchmarks.bench_concurrency --requests 200 --concurrency 50
+"""
+import argparse
+import asyncio
+import json
+import time
+from datetime import date, datetime
+
+import main
+from services import search_service
+from services.slot_grid import DayGrid
+
+def install_stubs(llm_latency, db_latency):
+    today = date.today().strftime("%Y-%m-%d")
+
+    def fake_intent(message):
+        time.sleep(llm_latency)
+        return {"intent": "check_slots", "date": today}
+
+    def fake_nearby(lat, lng, radius=60, limit=5):
+        time.sleep(db_latency)
+        return [{"post_title": f"Academy {i}", "address": "-", "distance": float(i)} for i in range(limit)]
+
+    def fake_grids(names, date_str):
+        time.sleep(db_latency)
+        day = datetime.strptime(date_str, "%Y-%m-%d")
+        return {name: DayGrid(day) for name in names}
+
+    main.get_intent_and_entities = fake_intent
+    search_service.find_nearby_centres = fake_nearby
+    search_service.get_day_grids = fake_grids
+    # Every request should pay the backend latency; caching is measured elsewhere.
+    search_service.result_cache = None
+
+async def run_inline(func, *args, **kwargs):
+    # The old behaviour: blocking calls made straight from the event loop.
+    return func(*args, **kwargs)
+
+async def measure(total, concurrency):
+    request = main.ChatRequest(message="slots today", latitude=30.757, longitude=76.78)
+    gate = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with gate:
+            await main.chat_handler(request)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    elapsed = time.perf_counter() - started
+    return {"requests": total, "concurrency": concurrency, "seconds": round(elapsed, 3), "rps": round(total / elapsed, 1)}
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="seconds per intent call")
+    parser.add_argument("--db-latency", type=float, default=0.02, help="seconds per DB call")
+    args = parser.parse_args()
+
+    install_stubs(args.llm_latency, args.db_latency)
+    offloaded = main.run_blocking
+
+    main.run_blocking = run_inline
+    before = asyncio.run(measure(args.requests, args.concurrency))
+    main.run_blocking = offloaded
+    after = asyncio.run(measure(args.requests, args.concurrency))
+
+    print(json.dumps({"before_blocking": before, "after_offloaded": after,
+                      "speedup": round(after["rps"] / before["rps"], 2)}, indent=2))
+
+if __name__ == "__main__":
+    main_cli()
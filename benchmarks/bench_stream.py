@@ -0,0 +1,58 @@
+"""
+Time-to-first-byte vs. total time for /chat and /chat/stream against a running server.
+
+    uvicorn main:app --port 8000
+    python -m benchmarks.bench_stream --url http://127.0.0.1:8000 --message "slots today" --runs 20
+"""
+import argparse
+import json
+import statistics
+import time
+
+import requests
+
+def timed_post(session, url, payload, stream):
+    started = time.perf_counter()
+    with session.post(url, json=payload, stream=stream) as resp:
+        resp.raise_for_status()
+        first = None
+        server = None
+        for line in resp.iter_lines():
+            if first is None:
+                first = time.perf_counter()
+            if stream and line.startswith(b"data: ") and b"ttfb_ms" in line:
+                server = json.loads(line[6:])
+        done = time.perf_counter()
+    return (first or done) - started, done - started, server
+
+def summarise(samples):
+    return {"p50_ms": round(statistics.median(samples) * 1000, 1), "max_ms": round(max(samples) * 1000, 1)}
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--message", default="slots today")
+    parser.add_argument("--latitude", type=float, default=30.7570)
+    parser.add_argument("--longitude", type=float, default=76.7800)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    payload = {"message": args.message, "latitude": args.latitude, "longitude": args.longitude}
+    session = requests.Session()
+    results = {}
+    for path, stream in (("/chat", False), ("/chat/stream", True)):
+        ttfb, total, server = [], [], []
+        for _ in range(args.runs):
+            first, done, timings = timed_post(session, args.url + path, payload, stream)
+            ttfb.append(first)
+            total.append(done)
+            if timings:
+                server.append(timings)
+        results[path] = {"ttfb": summarise(ttfb), "total": summarise(total)}
+        if server:
+            results[path]["server_ttfb_p50_ms"] = statistics.median(s["ttfb_ms"] for s in server)
+            results[path]["server_total_p50_ms"] = statistics.median(s["total_ms"] for s in server)
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,214 @@
+"""
+Benchmark suite against synthetic data, with no MySQL or Groq needed.
+
+Loads a generated academy_master into the SQLite stand-in (benchmarks/synthetic_db.py),
+replaces intent extraction with a stub of configurable latency (the local parser
+plus a sleep), then runs:
+  * microbenchmarks: find_nearby_centres (index and SQL), get_available_slots,
+    get_available_slots_bulk, format_time_ranges
+  * end-to-end /chat over a mix of messages at several concurrency levels
+and prints JSON. Save a run and pass it to --compare on a later commit to see ratios.
+
+    python -m benchmarks.bench_suite --academies 2000 --bookings-per-day 8 --output before.json
+    python -m benchmarks.bench_suite --academies 2000 --bookings-per-day 8 --compare before.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import time
+from datetime import date, timedelta
+
+from benchmarks.synthetic_db import SyntheticDatabase, generate_academy_master
+
+CENTRE = (30.7333, 76.7794)
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+def summarise(seconds):
+    return {
+        "calls": len(seconds),
+        "mean_us": round(sum(seconds) / len(seconds) * 1e6, 1),
+        "p50_us": round(percentile(seconds, 0.50) * 1e6, 1),
+        "p99_us": round(percentile(seconds, 0.99) * 1e6, 1),
+    }
+
+def micro(make_args, func, iterations, warmup=20):
+    """Time func(*make_args()) per call; argument generation is not timed."""
+    for _ in range(warmup):
+        func(*make_args())
+    seconds = []
+    for _ in range(iterations):
+        args = make_args()
+        started = time.perf_counter()
+        func(*args)
+        seconds.append(time.perf_counter() - started)
+    return summarise(seconds)
+
+def random_point(rng, spread_km):
+    return (CENTRE[0] + rng.uniform(-spread_km, spread_km) / 111.0,
+            CENTRE[1] + rng.uniform(-spread_km, spread_km) / 95.0)
+
+def run_micro(names, days, spread_km, iterations, rng):
+    from services.center_service import find_nearby_centres, find_nearby_centres_sql
+    from services.slot_service import get_available_slots, get_available_slots_bulk, get_day_grid
+    from main import format_time_ranges
+
+    dates = [(date.today() + timedelta(days=d)).strftime("%Y-%m-%d") for d in range(days)]
+    grids = [get_day_grid(rng.choice(names), rng.choice(dates)) for _ in range(50)]
+    slot_lists = [grid.free_slots() for grid in grids]
+
+    return {
+        "find_nearby_centres": micro(lambda: (*random_point(rng, spread_km), 60, 5), find_nearby_centres, iterations),
+        "find_nearby_centres_10km": micro(lambda: (*random_point(rng, spread_km), 10, 5), find_nearby_centres, iterations),
+        "find_nearby_centres_sql": micro(lambda: (*random_point(rng, spread_km), 60, 5), find_nearby_centres_sql,
+                                         max(10, iterations // 20)),
+        "get_available_slots": micro(lambda: (rng.choice(names), rng.choice(dates)), get_available_slots, iterations),
+        "get_available_slots_bulk_5": micro(lambda: (rng.sample(names, 5), rng.choice(dates)),
+                                            get_available_slots_bulk, iterations),
+        "format_time_ranges_grid": micro(lambda: (rng.choice(grids),), format_time_ranges, iterations),
+        "format_time_ranges_list": micro(lambda: (rng.choice(slot_lists),), format_time_ranges, iterations),
+    }
+
+def install_stub_intent(latency, known_names):
+    """Replace the LLM with the local parser plus `latency` seconds of sleep."""
+    import main
+    from metrics import timed
+    from intent_parser import parse_message
+
+    @timed("intent")
+    def stub_intent(message):
+        if latency:
+            time.sleep(latency)
+        return parse_message(message, known_names=known_names)[0]
+
+    main.get_intent_and_entities = stub_intent
+
+def message_mix(names, rng, count, spread_km):
+    templates = [
+        lambda: "academies near me",
+        lambda: "show me 5 academies nearby",
+        lambda: "any slots tomorrow",
+        lambda: "free slots today",
+        lambda: f"slots at {rng.choice(names)} tomorrow",
+        lambda: f"address of {rng.choice(names)}",
+        lambda: "how many academies are there",
+    ]
+    return [{"message": rng.choice(templates)(), "latitude": lat, "longitude": lng}
+            for lat, lng in (random_point(rng, spread_km) for _ in range(count))]
+
+async def run_chat_level(client, items, concurrency):
+    gate = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async def one(item):
+        nonlocal errors
+        async with gate:
+            started = time.perf_counter()
+            resp = await client.post("/chat", json=item)
+            latencies.append(time.perf_counter() - started)
+            if resp.status_code != 200:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(item) for item in items))
+    elapsed = time.perf_counter() - started
+    return {
+        "concurrency": concurrency,
+        "requests": len(items),
+        "errors": errors,
+        "rps": round(len(items) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+    }
+
+async def run_chat(items, levels):
+    import httpx
+    import main
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await run_chat_level(client, items[:20], 4)  # warm-up
+        return [await run_chat_level(client, items, level) for level in levels]
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except Exception:
+        return None
+
+def compare(current, previous):
+    """Ratios current/previous: p50 for microbenchmarks (lower is better), rps for /chat (higher is better)."""
+    ratios = {"micro_p50": {}, "chat_rps": {}}
+    for name, stats in current["micro"].items():
+        before = previous.get("micro", {}).get(name)
+        if before and before["p50_us"]:
+            ratios["micro_p50"][name] = round(stats["p50_us"] / before["p50_us"], 3)
+    before_levels = {level["concurrency"]: level for level in previous.get("chat", [])}
+    for level in current["chat"]:
+        before = before_levels.get(level["concurrency"])
+        if before and before["rps"]:
+            ratios["chat_rps"][str(level["concurrency"])] = round(level["rps"] / before["rps"], 3)
+    return {"against": previous.get("meta", {}).get("commit"), "ratios": ratios}
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--academies", type=int, default=1000)
+    parser.add_argument("--bookings-per-day", type=int, default=6)
+    parser.add_argument("--days", type=int, default=3)
+    parser.add_argument("--spread-km", type=float, default=50.0, help="radius of the area academies are spread over")
+    parser.add_argument("--iterations", type=int, default=500, help="calls per microbenchmark")
+    parser.add_argument("--requests", type=int, default=300, help="/chat requests per concurrency level")
+    parser.add_argument("--concurrency", default="1,8,32", help="comma-separated concurrency levels")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="seconds the stub intent call sleeps")
+    parser.add_argument("--with-cache", action="store_true", help="keep the search result cache on")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="also write the JSON here")
+    parser.add_argument("--compare", help="JSON from an earlier run to compute ratios against")
+    args = parser.parse_args()
+
+    os.environ.setdefault("GROQ_API_KEY", "stub")
+    rows = generate_academy_master(args.academies, args.bookings_per_day, args.days, CENTRE, args.spread_km,
+                                   seed=args.seed)
+    db = SyntheticDatabase(rows)
+    try:
+        db.install()
+        names = db.academy_names()
+
+        from services import search_service
+        if not args.with_cache:
+            search_service.result_cache = None
+        install_stub_intent(args.llm_latency, names)
+
+        rng = random.Random(args.seed)
+        levels = [int(level) for level in args.concurrency.split(",")]
+        results = {
+            "meta": {
+                "commit": git_commit(),
+                "python": platform.python_version(),
+                "started": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "params": vars(args),
+                "academy_master_rows": len(rows),
+            },
+            "micro": run_micro(names, args.days, args.spread_km, args.iterations, rng),
+            "chat": asyncio.run(run_chat(message_mix(names, rng, args.requests, args.spread_km), levels)),
+        }
+    finally:
+        db.remove()
+
+    if args.compare:
+        with open(args.compare) as f:
+            results["comparison"] = compare(results, json.load(f))
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,79 @@
+"""
+Local stand-in for the Groq chat-completions API.
+
+Answers POST /openai/v1/chat/completions with a fixed intent (or a list of them
+for batch prompts) after a configurable delay, optionally failing a fraction of
+requests. Point the app at it with:
+
+    python -m benchmarks.stub_groq_server --port 8089 --delay 0.3 --fail-rate 0.1
+    GROQ_BASE_URL=http://127.0.0.1:8089 GROQ_API_KEY=stub uvicorn main:app
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_INTENT = {"intent": "find_centres", "limit": 5}
+
+def make_handler(delay, jitter, fail_rate, intent):
+    class StubGroqHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+            prompt = body.get("messages", [{}])[0].get("content", "")
+            # Batch prompts list numbered queries and expect {"results": [...]}.
+            queries = re.findall(r"^\s*\d+\. ", prompt.split("QUERIES:", 1)[1], re.M) if "QUERIES:" in prompt else None
+            content = {"results": [intent] * len(queries)} if queries is not None else intent
+            time.sleep(max(0.0, delay + random.uniform(-jitter, jitter)))
+            if random.random() < fail_rate:
+                self._reply(503, {"error": {"message": "stub overloaded", "type": "server_error"}})
+                return
+            self._reply(200, {
+                "id": "stub", "object": "chat.completion", "created": int(time.time()), "model": "stub",
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": json.dumps(content)}}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            })
+
+        def _reply(self, status, body):
+            payload = json.dumps(body).encode()
+            try:
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # The client gave up (timeout); that is the point of some tests.
+
+    return StubGroqHandler
+
+def start_stub_server(port=0, delay=0.0, jitter=0.0, fail_rate=0.0, intent=None):
+    """Start the stub in a background thread; returns (server, base_url)."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(delay, jitter, fail_rate, intent or DEFAULT_INTENT))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--delay", type=float, default=0.3, help="seconds before answering")
+    parser.add_argument("--jitter", type=float, default=0.0, help="+/- seconds of random delay")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--intent", default=json.dumps(DEFAULT_INTENT), help="JSON the stub returns as the completion")
+    args = parser.parse_args()
+    server, url = start_stub_server(args.port, args.delay, args.jitter, args.fail_rate, json.loads(args.intent))
+    print(f"Stub Groq API on {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
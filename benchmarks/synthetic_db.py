@@ -0,0 +1,175 @@
+"""
+Synthetic academy data in a local SQLite stand-in for MySQL.
+
+`generate_academy_master` builds `academy_master` rows (one per booking, plus a
+bare row for academies with none), and `SyntheticDatabase` loads them into a
+SQLite file with the `academies`, `bookings` and `academy_stats` tables derived
+the way db_migrations.py backfills them. `install()` points db_config's pool at
+it, so the real service code runs unchanged:
+
+    db = SyntheticDatabase(generate_academy_master(academies=2000, bookings_per_day=6))
+    db.install()
+"""
+import math
+import os
+import random
+import re
+import sqlite3
+import tempfile
+from datetime import date, datetime, timedelta
+
+WORDS = ["Sunrise", "Ace", "Baseline", "Champions", "Green", "Court", "Topspin", "Royal", "Valley",
+         "Smash", "Rally", "Grand", "Victory", "Lakeside", "Hilltop", "Metro", "Eagle", "Falcon"]
+
+def generate_academy_master(academies=500, bookings_per_day=6, days=3, centre=(30.7333, 76.7794),
+                            spread_km=50.0, start=None, seed=7):
+    """
+    academy_master rows for `academies` academies scattered uniformly over a disc of
+    `spread_km` around `centre`, each with `bookings_per_day` one-hour bookings on
+    each of `days` days from `start` (default today).
+    """
+    rng = random.Random(seed)
+    start = start or date.today()
+    rows = []
+    for i in range(academies):
+        name = f"{rng.choice(WORDS)} {rng.choice(WORDS)} Tennis Academy {i}"
+        # Uniform over the disc: sqrt keeps density constant towards the edge.
+        distance = spread_km * math.sqrt(rng.random())
+        bearing = rng.uniform(0, 2 * math.pi)
+        lat = centre[0] + (distance * math.cos(bearing)) / 111.0
+        lng = centre[1] + (distance * math.sin(bearing)) / (111.0 * math.cos(math.radians(centre[0])))
+        address = f"{rng.randint(1, 400)} Sector {rng.randint(1, 60)}"
+        bookings = []
+        for d in range(days):
+            day = datetime.combine(start + timedelta(days=d), datetime.min.time())
+            for hour in rng.sample(range(6, 24), min(bookings_per_day, 18)):
+                bookings.append((day + timedelta(hours=hour), day + timedelta(hours=hour + 1)))
+        for slot_start, slot_end in bookings or [(None, None)]:
+            rows.append((len(rows) + 1, name, address, lat, lng, slot_start, slot_end))
+    return rows
+
+def _as_sql_value(value):
+    return value.strftime("%Y-%m-%d %H:%M:%S") if isinstance(value, datetime) else value
+
+def _translate(query):
+    # MySQL placeholders, and HAVING on a computed column without GROUP BY,
+    # which SQLite rejects: filter an inner select instead.
+    query = query.strip().rstrip(";").replace("%s", "?")
+    match = re.match(r"(?is)(select .*?)\bhaving\b(.*?)(\border by\b.*)?$", query)
+    if match and not re.search(r"(?i)\bgroup by\b", match.group(1)):
+        query = f"SELECT * FROM ({match.group(1)}) WHERE {match.group(2)} {match.group(3) or ''}"
+    return query
+
+class SyntheticCursor:
+    """
+    The slice of mysql.connector's cursor API the services use.
+    """
+    def __init__(self, raw, dictionary=False):
+        self._raw = raw
+        self._dictionary = dictionary
+
+    def execute(self, query, params=()):
+        self._raw.execute(_translate(query), [_as_sql_value(p) for p in params])
+
+    def _row(self, row):
+        if row is None or not self._dictionary:
+            return row
+        return {col[0]: value for col, value in zip(self._raw.description, row)}
+
+    def fetchone(self):
+        return self._row(self._raw.fetchone())
+
+    def fetchall(self):
+        return [self._row(row) for row in self._raw.fetchall()]
+
+    def close(self):
+        self._raw.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class SyntheticConnection:
+    in_transaction = False
+
+    def __init__(self, path):
+        self._raw = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        for name, func in (("acos", math.acos), ("cos", math.cos), ("sin", math.sin), ("radians", math.radians)):
+            self._raw.create_function(name, 1, func, deterministic=True)
+        self._raw.create_function("LEAST", 2, min, deterministic=True)
+        self._raw.create_function("GREATEST", 2, max, deterministic=True)
+
+    def cursor(self, dictionary=False, **kwargs):
+        return SyntheticCursor(self._raw.cursor(), dictionary)
+
+    def ping(self, **kwargs):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self._raw.close()
+
+class SyntheticDatabase:
+    def __init__(self, rows, path=None):
+        if path is None:
+            fd, path = tempfile.mkstemp(prefix="tida-bench-", suffix=".sqlite3")
+            os.close(fd)
+        self.path = path
+        conn = sqlite3.connect(path)
+        conn.executescript("""
+            DROP TABLE IF EXISTS academy_master;
+            DROP TABLE IF EXISTS academies;
+            DROP TABLE IF EXISTS bookings;
+            DROP TABLE IF EXISTS academy_stats;
+            CREATE TABLE academy_master (id INTEGER PRIMARY KEY, academy_name TEXT, address TEXT,
+                                         latitude REAL, longitude REAL, slot_start TEXT, slot_end TEXT);
+            CREATE TABLE academies (id INTEGER PRIMARY KEY, academy_name TEXT NOT NULL UNIQUE COLLATE NOCASE,
+                                    address TEXT, latitude REAL, longitude REAL);
+            CREATE TABLE bookings (id INTEGER PRIMARY KEY, academy_id INTEGER NOT NULL,
+                                   slot_start TEXT NOT NULL, slot_end TEXT NOT NULL, source_id INTEGER);
+            CREATE INDEX idx_bookings_academy_start ON bookings (academy_id, slot_start);
+            CREATE TABLE academy_stats (id INTEGER PRIMARY KEY, academy_count INTEGER NOT NULL);
+        """)
+        conn.executemany("INSERT INTO academy_master VALUES (?, ?, ?, ?, ?, ?, ?)",
+                         [tuple(_as_sql_value(v) for v in row) for row in rows])
+        # Same backfill as migration 001_academies_and_bookings.
+        conn.executescript("""
+            INSERT INTO academies (academy_name, address, latitude, longitude)
+            SELECT academy_name, MIN(address), AVG(latitude), AVG(longitude)
+            FROM academy_master GROUP BY academy_name;
+            INSERT INTO bookings (academy_id, slot_start, slot_end, source_id)
+            SELECT a.id, m.slot_start, m.slot_end, m.id
+            FROM academy_master m JOIN academies a ON a.academy_name = m.academy_name
+            WHERE m.slot_start IS NOT NULL AND m.slot_end IS NOT NULL;
+            INSERT INTO academy_stats (id, academy_count) SELECT 1, COUNT(*) FROM academies;
+        """)
+        conn.commit()
+        conn.close()
+
+    def connect(self, **settings):
+        return SyntheticConnection(self.path)
+
+    def academy_names(self):
+        conn = sqlite3.connect(self.path)
+        try:
+            return [row[0] for row in conn.execute("SELECT academy_name FROM academies ORDER BY id")]
+        finally:
+            conn.close()
+
+    def install(self, pool_size=8):
+        """Route get_db_connection() to this database and rebuild the academy index from it."""
+        import db_config
+        from services.academy_index import refresh_academy_index
+        if db_config._pool is not None:
+            db_config._pool.close_all()
+        db_config._pool = db_config.ConnectionPool(size=pool_size, connect=self.connect)
+        db_config._pool_pid = os.getpid()
+        refresh_academy_index()
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
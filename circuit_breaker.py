@@ -0,0 +1,61 @@
+import time
+import threading
+
+class CircuitOpenError(Exception):
+    pass
+
+class CircuitBreaker:
+    """
+    Closed -> open after `failure_threshold` consecutive failures. While open every
+    call fails fast; after `reset_after` seconds one trial call is let through
+    (half-open) and its outcome closes or re-opens the circuit.
+    """
+    def __init__(self, name, failure_threshold=5, reset_after=30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+        self._stats = {"successes": 0, "failures": 0, "rejected": 0, "opened": 0}
+
+    def allow(self):
+        """Raise CircuitOpenError instead of letting a call through."""
+        with self._lock:
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_after:
+                self.state = "half_open"
+            if self.state == "closed":
+                return
+            if self.state == "half_open" and not self._trial_running:
+                self._trial_running = True
+                return
+            self._stats["rejected"] += 1
+        raise CircuitOpenError(f"{self.name} circuit is {self.state}")
+
+    def record_success(self):
+        with self._lock:
+            self._stats["successes"] += 1
+            self.consecutive_failures = 0
+            self._trial_running = False
+            self.state = "closed"
+
+    def record_failure(self):
+        with self._lock:
+            self._stats["failures"] += 1
+            self.consecutive_failures += 1
+            self._trial_running = False
+            if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+                if self.state != "open":
+                    self._stats["opened"] += 1
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def snapshot(self):
+        with self._lock:
+            snap = dict(self._stats)
+            snap.update({"state": self.state, "consecutive_failures": self.consecutive_failures})
+            if self.state == "open":
+                snap["retry_in"] = round(max(0.0, self.reset_after - (time.monotonic() - self.opened_at)), 2)
+        return snap
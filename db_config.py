@@ -1,13 +1,241 @@
 import os
+import queue
+import threading
+import time
 import mysql.connector
+from mysql.connector.errors import PoolError, OperationalError, InterfaceError
+from metrics import stage, count_db_query
 
-def get_db_connection():
+def get_db_settings():
     # Railway provides these variables automatically.
     # On your laptop, it falls back to "localhost", "root", etc.
-    return mysql.connector.connect(
-        host=os.environ.get("DB_HOST", "localhost"),
-        user=os.environ.get("DB_USER", "root"),
-        password=os.environ.get("DB_PASSWORD", "anshitdassdA2"), # <--- PUT YOUR LOCAL PASSWORD HERE
-        port=int(os.environ.get("DB_PORT", 3307)),
-        database=os.environ.get("DB_NAME", "tida")
-    )
\ No newline at end of file
+    return {
+        "host": os.environ.get("DB_HOST", "localhost"),
+        "user": os.environ.get("DB_USER", "root"),
+        "password": os.environ.get("DB_PASSWORD", "anshitdassdA2"), # <--- PUT YOUR LOCAL PASSWORD HERE
+        "port": int(os.environ.get("DB_PORT", 3307)),
+        "database": os.environ.get("DB_NAME", "tida"),
+    }
+
+# Errors that mean the connection itself is gone (server restart, failover, timeout).
+CONNECTION_ERRORS = (OperationalError, InterfaceError)
+
+class CountingCursor:
+    """
+    Cursor wrapper that counts execute() calls towards the current request's metrics,
+    and marks its connection broken when the server has gone away.
+    """
+    def __init__(self, raw, connection=None):
+        self._raw = raw
+        self._connection = connection
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def __iter__(self):
+        return iter(self._raw)
+
+    def _call(self, method, *args, **kwargs):
+        try:
+            return method(*args, **kwargs)
+        except CONNECTION_ERRORS:
+            if self._connection is not None:
+                self._connection.broken = True
+            raise
+
+    def execute(self, *args, **kwargs):
+        count_db_query()
+        return self._call(self._raw.execute, *args, **kwargs)
+
+    def executemany(self, *args, **kwargs):
+        count_db_query()
+        return self._call(self._raw.executemany, *args, **kwargs)
+
+    def fetchone(self):
+        return self._call(self._raw.fetchone)
+
+    def fetchmany(self, *args, **kwargs):
+        return self._call(self._raw.fetchmany, *args, **kwargs)
+
+    def fetchall(self):
+        return self._call(self._raw.fetchall)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._raw.close()
+
+class PooledConnection:
+    """
+    Thin wrapper around a MySQL connection borrowed from the pool.
+    Behaves like the real connection, but close() hands it back to the pool.
+    """
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+        self._closed = False
+        self.broken = False  # set by CountingCursor on a connection-level error
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def cursor(self, *args, **kwargs):
+        try:
+            return CountingCursor(self._raw.cursor(*args, **kwargs), self)
+        except CONNECTION_ERRORS:
+            self.broken = True
+            raise
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._pool.release(self._raw, broken=self.broken)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class ConnectionPool:
+    """
+    Fixed-size pool of MySQL connections.
+    Connections are opened lazily, health-checked (ping) when they have been idle
+    for a while, and callers wait up to `timeout` seconds when all are checked out.
+    """
+    def __init__(self, size=5, timeout=5.0, health_check_after=30.0, connect=None, **settings):
+        self.size = size
+        self.timeout = timeout
+        self.health_check_after = health_check_after
+        self._connect = connect or mysql.connector.connect
+        self._settings = settings
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._stats = {"checkouts": 0, "waits": 0, "timeouts": 0, "discarded": 0, "wait_seconds": 0.0}
+
+    def _open(self):
+        # Services only read, so autocommit avoids stale REPEATABLE READ snapshots between checkouts.
+        raw = self._connect(autocommit=True, **self._settings)
+        return raw
+
+    def _healthy(self, raw, idle_since):
+        if time.monotonic() - idle_since < self.health_check_after:
+            return True
+        try:
+            raw.ping(reconnect=True, attempts=1, delay=0)
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, raw):
+        with self._lock:
+            self._created -= 1
+            self._stats["discarded"] += 1
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    def acquire(self):
+        started = time.monotonic()
+        deadline = started + self.timeout
+        waited = False
+        while True:
+            try:
+                raw, idle_since = self._idle.get_nowait()
+            except queue.Empty:
+                raw = None
+                with self._lock:
+                    can_open = self._created < self.size
+                    if can_open:
+                        self._created += 1
+                if can_open:
+                    try:
+                        raw = self._open()
+                    except Exception:
+                        with self._lock:
+                            self._created -= 1
+                        raise
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    with self._lock:
+                        self._stats["timeouts"] += 1
+                    raise PoolError(f"Timed out after {self.timeout}s waiting for a database connection (pool size {self.size})")
+                waited = True
+                try:
+                    raw, idle_since = self._idle.get(timeout=remaining)
+                except queue.Empty:
+                    continue
+            if self._healthy(raw, idle_since):
+                break
+            self._discard(raw)
+
+        with self._lock:
+            self._stats["checkouts"] += 1
+            if waited:
+                self._stats["waits"] += 1
+            self._stats["wait_seconds"] += time.monotonic() - started
+        return PooledConnection(self, raw)
+
+    def release(self, raw, broken=False):
+        # A dead connection must not go back to the LIFO queue: with steady traffic
+        # it would never sit idle long enough to be pinged, and fail every checkout.
+        if broken:
+            self._discard(raw)
+            return
+        try:
+            if raw.in_transaction:
+                raw.rollback()
+        except Exception:
+            self._discard(raw)
+            return
+        self._idle.put((raw, time.monotonic()))
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            created = self._created
+        idle = self._idle.qsize()
+        stats.update({"size": self.size, "open": created, "idle": idle, "in_use": created - idle})
+        return stats
+
+    def close_all(self):
+        while True:
+            try:
+                raw, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(raw)
+
+# --- PROCESS-WIDE POOL ---
+# One pool per process. Streamlit keeps imported modules alive between reruns,
+# so ui.py and the FastAPI workers both end up sharing a single pool each.
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    global _pool, _pool_pid
+    if _pool is None or _pool_pid != os.getpid():
+        with _pool_lock:
+            # A forked worker must not reuse sockets opened by its parent.
+            if _pool is None or _pool_pid != os.getpid():
+                _pool = ConnectionPool(
+                    size=int(os.environ.get("DB_POOL_SIZE", 5)),
+                    timeout=float(os.environ.get("DB_POOL_TIMEOUT", 5)),
+                    health_check_after=float(os.environ.get("DB_POOL_HEALTH_CHECK", 30)),
+                    **get_db_settings()
+                )
+                _pool_pid = os.getpid()
+    return _pool
+
+def get_db_connection():
+    # Borrow a connection; calling .close() on it returns it to the pool.
+    with stage("db_acquire"):
+        return get_pool().acquire()
+
+def pool_stats():
+    return get_pool().stats()
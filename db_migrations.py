@@ -0,0 +1,265 @@
+"""
+Schema migrations for the TIDA database.
+
+`academy_master` mixes academy details with bookings, so every lookup had to
+aggregate over booking rows. These migrations add:
+  * academies - one row per academy name (address + location)
+  * bookings  - one row per booking, indexed on (academy_id, slot_start)
+  * academy_stats - the academy count, so counting is a single-row read
+and triggers that keep them in sync while other systems still write to
+academy_master. Each academy's centroid and canonical (MIN) address are
+maintained incrementally from running sums instead of re-aggregating.
+Every statement can be re-run. DDL autocommits, so a migration that fails
+partway (e.g. CREATE TRIGGER on managed MySQL without SUPER or
+log_bin_trust_function_creators) is finished by running it again once fixed:
+
+    python db_migrations.py
+"""
+from db_config import get_db_connection
+
+MIGRATIONS = [
+    ("001_academies_and_bookings", [
+        """
+        CREATE TABLE IF NOT EXISTS academies (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            academy_name VARCHAR(255) NOT NULL,
+            address VARCHAR(1024),
+            latitude DOUBLE,
+            longitude DOUBLE,
+            UNIQUE KEY uq_academies_name (academy_name)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS bookings (
+            id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            academy_id INT NOT NULL,
+            slot_start DATETIME NOT NULL,
+            slot_end DATETIME NOT NULL,
+            source_id INT NULL,
+            KEY idx_bookings_academy_start (academy_id, slot_start),
+            UNIQUE KEY uq_bookings_source (source_id),
+            CONSTRAINT fk_bookings_academy FOREIGN KEY (academy_id) REFERENCES academies (id)
+        )
+        """,
+        # Backfill: same deduplication the old queries did on the fly.
+        """
+        INSERT INTO academies (academy_name, address, latitude, longitude)
+        SELECT academy_name, MIN(address), AVG(latitude), AVG(longitude)
+        FROM academy_master
+        GROUP BY academy_name
+        ON DUPLICATE KEY UPDATE
+            address = VALUES(address), latitude = VALUES(latitude), longitude = VALUES(longitude)
+        """,
+        """
+        INSERT IGNORE INTO bookings (academy_id, slot_start, slot_end, source_id)
+        SELECT a.id, m.slot_start, m.slot_end, m.id
+        FROM academy_master m
+        JOIN academies a ON a.academy_name = m.academy_name
+        WHERE m.slot_start IS NOT NULL AND m.slot_end IS NOT NULL
+        """,
+        # Dual-write: rows still inserted into academy_master show up in the new tables.
+        "DROP TRIGGER IF EXISTS trg_academy_master_insert",
+        """
+        CREATE TRIGGER trg_academy_master_insert AFTER INSERT ON academy_master FOR EACH ROW
+        BEGIN
+            INSERT INTO academies (academy_name, address, latitude, longitude)
+            VALUES (NEW.academy_name, NEW.address, NEW.latitude, NEW.longitude)
+            ON DUPLICATE KEY UPDATE id = id;
+            IF NEW.slot_start IS NOT NULL AND NEW.slot_end IS NOT NULL THEN
+                INSERT INTO bookings (academy_id, slot_start, slot_end, source_id)
+                SELECT id, NEW.slot_start, NEW.slot_end, NEW.id FROM academies WHERE academy_name = NEW.academy_name;
+            END IF;
+        END
+        """,
+        "DROP TRIGGER IF EXISTS trg_academy_master_update",
+        """
+        CREATE TRIGGER trg_academy_master_update AFTER UPDATE ON academy_master FOR EACH ROW
+        BEGIN
+            INSERT INTO academies (academy_name, address, latitude, longitude)
+            VALUES (NEW.academy_name, NEW.address, NEW.latitude, NEW.longitude)
+            ON DUPLICATE KEY UPDATE id = id;
+            DELETE FROM bookings WHERE source_id = OLD.id;
+            IF NEW.slot_start IS NOT NULL AND NEW.slot_end IS NOT NULL THEN
+                INSERT INTO bookings (academy_id, slot_start, slot_end, source_id)
+                SELECT id, NEW.slot_start, NEW.slot_end, NEW.id FROM academies WHERE academy_name = NEW.academy_name;
+            END IF;
+        END
+        """,
+        "DROP TRIGGER IF EXISTS trg_academy_master_delete",
+        """
+        CREATE TRIGGER trg_academy_master_delete AFTER DELETE ON academy_master FOR EACH ROW
+        BEGIN
+            DELETE FROM bookings WHERE source_id = OLD.id;
+        END
+        """,
+    ]),
+    ("002_incremental_academy_summary", [
+        # Running sums let the triggers move an academy's centroid without re-aggregating.
+        lambda cursor: _ensure_column(cursor, "academies", "source_rows", "INT NOT NULL DEFAULT 0"),
+        lambda cursor: _ensure_column(cursor, "academies", "located_rows", "INT NOT NULL DEFAULT 0"),
+        lambda cursor: _ensure_column(cursor, "academies", "latitude_sum", "DOUBLE NOT NULL DEFAULT 0"),
+        lambda cursor: _ensure_column(cursor, "academies", "longitude_sum", "DOUBLE NOT NULL DEFAULT 0"),
+        """
+        UPDATE academies a
+        JOIN (
+            SELECT academy_name,
+                   COUNT(*) AS source_rows,
+                   SUM(latitude IS NOT NULL AND longitude IS NOT NULL) AS located_rows,
+                   SUM(IF(latitude IS NOT NULL AND longitude IS NOT NULL, latitude, 0)) AS latitude_sum,
+                   SUM(IF(latitude IS NOT NULL AND longitude IS NOT NULL, longitude, 0)) AS longitude_sum
+            FROM academy_master
+            GROUP BY academy_name
+        ) m ON m.academy_name = a.academy_name
+        SET a.source_rows = m.source_rows,
+            a.located_rows = m.located_rows,
+            a.latitude_sum = m.latitude_sum,
+            a.longitude_sum = m.longitude_sum
+        """,
+        # Only needed when the canonical (MIN) address row is removed.
+        lambda cursor: _ensure_index(cursor, "academy_master", "idx_academy_master_name", "academy_name"),
+        """
+        CREATE TABLE IF NOT EXISTS academy_stats (
+            id TINYINT PRIMARY KEY,
+            academy_count INT NOT NULL
+        )
+        """,
+        """
+        INSERT INTO academy_stats (id, academy_count)
+        SELECT 1, COUNT(*) FROM academies
+        ON DUPLICATE KEY UPDATE academy_count = VALUES(academy_count)
+        """,
+        "DROP TRIGGER IF EXISTS trg_academies_insert",
+        """
+        CREATE TRIGGER trg_academies_insert AFTER INSERT ON academies FOR EACH ROW
+            UPDATE academy_stats SET academy_count = academy_count + 1 WHERE id = 1
+        """,
+        "DROP TRIGGER IF EXISTS trg_academies_delete",
+        """
+        CREATE TRIGGER trg_academies_delete AFTER DELETE ON academies FOR EACH ROW
+            UPDATE academy_stats SET academy_count = academy_count - 1 WHERE id = 1
+        """,
+        "DROP PROCEDURE IF EXISTS academy_summary_add",
+        """
+        CREATE PROCEDURE academy_summary_add(IN p_name VARCHAR(255), IN p_address VARCHAR(1024), IN p_lat DOUBLE, IN p_lng DOUBLE)
+        BEGIN
+            DECLARE located INT DEFAULT IF(p_lat IS NULL OR p_lng IS NULL, 0, 1);
+            INSERT INTO academies (academy_name, address, latitude, longitude, source_rows, located_rows, latitude_sum, longitude_sum)
+            VALUES (p_name, p_address, IF(located, p_lat, NULL), IF(located, p_lng, NULL), 1, located, IF(located, p_lat, 0), IF(located, p_lng, 0))
+            ON DUPLICATE KEY UPDATE
+                address = IF(address IS NULL OR VALUES(address) < address, VALUES(address), address),
+                source_rows = source_rows + 1,
+                located_rows = located_rows + located,
+                latitude_sum = latitude_sum + IF(located, p_lat, 0),
+                longitude_sum = longitude_sum + IF(located, p_lng, 0),
+                latitude = IF(located_rows > 0, latitude_sum / located_rows, NULL),
+                longitude = IF(located_rows > 0, longitude_sum / located_rows, NULL);
+        END
+        """,
+        "DROP PROCEDURE IF EXISTS academy_summary_remove",
+        """
+        CREATE PROCEDURE academy_summary_remove(IN p_name VARCHAR(255), IN p_address VARCHAR(1024), IN p_lat DOUBLE, IN p_lng DOUBLE)
+        BEGIN
+            DECLARE located INT DEFAULT IF(p_lat IS NULL OR p_lng IS NULL, 0, 1);
+            UPDATE academies SET
+                source_rows = source_rows - 1,
+                located_rows = located_rows - located,
+                latitude_sum = latitude_sum - IF(located, p_lat, 0),
+                longitude_sum = longitude_sum - IF(located, p_lng, 0),
+                latitude = IF(located_rows > 0, latitude_sum / located_rows, NULL),
+                longitude = IF(located_rows > 0, longitude_sum / located_rows, NULL)
+            WHERE academy_name = p_name;
+            DELETE FROM academies
+            WHERE academy_name = p_name AND source_rows <= 0
+              AND NOT EXISTS (SELECT 1 FROM bookings WHERE bookings.academy_id = academies.id);
+            IF p_address IS NOT NULL THEN
+                UPDATE academies
+                SET address = (SELECT MIN(address) FROM academy_master WHERE academy_name = p_name)
+                WHERE academy_name = p_name AND address = p_address;
+            END IF;
+        END
+        """,
+        # Replace the 001 triggers: same booking sync, plus the summary maintenance.
+        "DROP TRIGGER IF EXISTS trg_academy_master_insert",
+        """
+        CREATE TRIGGER trg_academy_master_insert AFTER INSERT ON academy_master FOR EACH ROW
+        BEGIN
+            CALL academy_summary_add(NEW.academy_name, NEW.address, NEW.latitude, NEW.longitude);
+            IF NEW.slot_start IS NOT NULL AND NEW.slot_end IS NOT NULL THEN
+                INSERT INTO bookings (academy_id, slot_start, slot_end, source_id)
+                SELECT id, NEW.slot_start, NEW.slot_end, NEW.id FROM academies WHERE academy_name = NEW.academy_name;
+            END IF;
+        END
+        """,
+        "DROP TRIGGER IF EXISTS trg_academy_master_update",
+        """
+        CREATE TRIGGER trg_academy_master_update AFTER UPDATE ON academy_master FOR EACH ROW
+        BEGIN
+            DELETE FROM bookings WHERE source_id = OLD.id;
+            CALL academy_summary_remove(OLD.academy_name, OLD.address, OLD.latitude, OLD.longitude);
+            CALL academy_summary_add(NEW.academy_name, NEW.address, NEW.latitude, NEW.longitude);
+            IF NEW.slot_start IS NOT NULL AND NEW.slot_end IS NOT NULL THEN
+                INSERT INTO bookings (academy_id, slot_start, slot_end, source_id)
+                SELECT id, NEW.slot_start, NEW.slot_end, NEW.id FROM academies WHERE academy_name = NEW.academy_name;
+            END IF;
+        END
+        """,
+        "DROP TRIGGER IF EXISTS trg_academy_master_delete",
+        """
+        CREATE TRIGGER trg_academy_master_delete AFTER DELETE ON academy_master FOR EACH ROW
+        BEGIN
+            DELETE FROM bookings WHERE source_id = OLD.id;
+            CALL academy_summary_remove(OLD.academy_name, OLD.address, OLD.latitude, OLD.longitude);
+        END
+        """,
+    ]),
+]
+
+def _ensure_index(cursor, table, name, columns):
+    # MySQL has no CREATE INDEX IF NOT EXISTS.
+    cursor.execute(
+        "SELECT 1 FROM information_schema.statistics WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s LIMIT 1",
+        (table, name),
+    )
+    if cursor.fetchone() is None:
+        cursor.execute(f"CREATE INDEX {name} ON {table} ({columns})")
+
+def _ensure_column(cursor, table, name, definition):
+    # Nor ADD COLUMN IF NOT EXISTS; DDL also autocommits, so a rerun must skip columns already added.
+    cursor.execute(
+        "SELECT 1 FROM information_schema.columns WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s LIMIT 1",
+        (table, name),
+    )
+    if cursor.fetchone() is None:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+
+def migrate():
+    """Apply every migration not yet recorded in schema_migrations. Returns the names applied."""
+    conn = get_db_connection()
+    applied = []
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                name VARCHAR(255) PRIMARY KEY,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """)
+            cursor.execute("SELECT name FROM schema_migrations")
+            done = {row[0] for row in cursor.fetchall()}
+            for name, statements in MIGRATIONS:
+                if name in done:
+                    continue
+                for statement in statements:
+                    if callable(statement):
+                        statement(cursor)
+                    else:
+                        cursor.execute(statement)
+                cursor.execute("INSERT INTO schema_migrations (name) VALUES (%s)", (name,))
+                applied.append(name)
+    finally:
+        conn.close()
+    return applied
+
+if __name__ == "__main__":
+    names = migrate()
+    print("Applied: " + ", ".join(names) if names else "Database already up to date.")
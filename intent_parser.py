@@ -0,0 +1,299 @@
+import os
+import re
+import threading
+from datetime import date, timedelta
+from services.search_service import NEXT_AVAILABLE_DAYS
+
+# Below this confidence the message is handed to the LLM instead.
+MIN_CONFIDENCE = float(os.environ.get("INTENT_FAST_PATH_MIN_CONFIDENCE", 0.8))
+
+MONTHS = {
+    "jan": 1, "feb": 2, "mar": 3, "apr": 4, "may": 5, "jun": 6,
+    "jul": 7, "aug": 8, "sep": 9, "oct": 10, "nov": 11, "dec": 12,
+}
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+COUNT_WORDS = {"how many", "total", "stats", "statistics", "count"}
+SLOT_WORDS = {"slot", "slots", "available", "availability", "free", "book", "booking", "open"}
+ADDRESS_WORDS = {"address", "where is", "location of", "directions"}
+NEXT_WORDS = {"next available", "next free", "next open", "next opening", "next slot", "earliest", "soonest",
+              "first available", "first free", "when is"}
+FIND_WORDS = {"near me", "nearby", "closest", "nearest", "around me", "academies", "academy", "centres", "centers", "find", "show", "list"}
+
+# Words that carry no entity information; anything else we could not explain lowers confidence.
+FILLER_WORDS = {
+    "a", "an", "the", "for", "on", "at", "in", "of", "to", "me", "my", "i", "is", "are", "any", "there",
+    "please", "pls", "can", "you", "check", "what", "whats", "which", "do", "does", "have", "has", "get",
+    "tell", "give", "want", "need", "see", "all", "some", "with", "and", "or", "from", "this", "next",
+    "many", "how", "much", "near", "where", "by", "time", "date", "day", "sports", "tennis", "hi", "hello",
+    "st", "nd", "rd", "th", "am", "pm", "there", "us", "we", "our", "be", "will", "would", "like", "up", "s", "top", "first",
+    "anything", "something", "opening", "openings",
+} | SLOT_WORDS | {w for phrase in COUNT_WORDS | ADDRESS_WORDS | FIND_WORDS | NEXT_WORDS for w in phrase.split()}
+
+DAY_PARTS = {
+    "morning": ("06:00", "12:00"), "afternoon": ("12:00", "17:00"),
+    "evening": ("17:00", "22:00"), "night": ("20:00", "24:00"),
+}
+
+GENERIC_NAME_WORDS = {"academy", "sports", "tennis", "club", "centre", "center", "the", "of"}
+
+_MONTH_RE = r"(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*"
+_DAY_RE = r"(\d{1,2})(?:st|nd|rd|th)?"
+
+def _normalise(text):
+    return " ".join(re.sub(r"[^a-z0-9:/ -]", " ", str(text).lower()).split())
+
+def _safe_date(year, month, day):
+    try:
+        return date(year, month, day)
+    except ValueError:
+        return None
+
+def parse_date(text, today):
+    """
+    Resolve relative and absolute dates. Returns (date or None, matched spans).
+    Day/month order follows local usage ("24/04" is 24 April).
+    """
+    rules = [
+        (r"\bday after tomorrow\b", lambda m: today + timedelta(days=2)),
+        (r"\b(today|tonight)\b", lambda m: today),
+        (r"\b(tomorrow|tmrw|tmr|tomorow)\b", lambda m: today + timedelta(days=1)),
+        (r"\bin (\d{1,2}) days?\b", lambda m: today + timedelta(days=int(m.group(1)))),
+        (r"\b(\d{4})-(\d{1,2})-(\d{1,2})\b", lambda m: _safe_date(int(m.group(1)), int(m.group(2)), int(m.group(3)))),
+        (rf"\b{_DAY_RE}\s+(?:of\s+)?{_MONTH_RE}(?:\s+(\d{{4}}))?\b",
+         lambda m: _safe_date(int(m.group(3) or today.year), MONTHS[m.group(2)], int(m.group(1)))),
+        (rf"\b{_MONTH_RE}\s+{_DAY_RE}\b(?:,?\s+(\d{{4}}))?",
+         lambda m: _safe_date(int(m.group(3) or today.year), MONTHS[m.group(1)], int(m.group(2)))),
+        (r"\b(\d{1,2})/(\d{1,2})(?:/(\d{2,4}))?\b",
+         lambda m: _safe_date(_full_year(m.group(3), today), int(m.group(2)), int(m.group(1)))),
+        (r"\b(next |this )?(" + "|".join(WEEKDAYS) + r")\b", lambda m: _weekday(m, today)),
+    ]
+    for pattern, resolve in rules:
+        m = re.search(pattern, text)
+        if m:
+            return resolve(m), [m.span()]
+    return None, []
+
+def _full_year(value, today):
+    if not value:
+        return today.year
+    year = int(value)
+    return year + 2000 if year < 100 else year
+
+def _weekday(m, today):
+    ahead = (WEEKDAYS.index(m.group(2)) - today.weekday()) % 7
+    if m.group(1) and m.group(1).strip() == "next" and ahead == 0:
+        ahead = 7
+    return today + timedelta(days=ahead)
+
+def parse_time(text):
+    """'6pm', '6:30 pm', '18:00' -> 'HH:MM'. Returns (time or None, matched spans)."""
+    m = re.search(r"\b(\d{1,2})(?::([0-5]\d))?\s*(am|pm)\b", text)
+    if m:
+        hour = int(m.group(1)) % 12 + (12 if m.group(3) == "pm" else 0)
+        if int(m.group(1)) <= 12:
+            return f"{hour:02d}:{m.group(2) or '00'}", [m.span()]
+    m = re.search(r"\b([01]?\d|2[0-3]):([0-5]\d)\b", text)
+    if m:
+        return f"{int(m.group(1)):02d}:{m.group(2)}", [m.span()]
+    return None, []
+
+_TIME_RE = r"(\d{1,2}(?::[0-5]\d)?\s*(?:am|pm)|(?:[01]?\d|2[0-3]):[0-5]\d)"
+
+def parse_range(text, today):
+    """
+    'this week', 'next 3 days', 'the weekend' -> (start date or None, days or None, matched spans).
+    """
+    m = re.search(r"\b(?:next|coming) (\d{1,2}) days\b", text)
+    if m:
+        return today, max(1, int(m.group(1))), [m.span()]
+    m = re.search(r"\b(?:next|coming) few days\b", text)
+    if m:
+        return today, 3, [m.span()]
+    m = re.search(r"\bthis week\b", text)
+    if m:
+        return today, 7, [m.span()]
+    m = re.search(r"\bnext week\b", text)
+    if m:
+        return today + timedelta(days=7 - today.weekday()), 7, [m.span()]
+    m = re.search(r"\b(?:this )?weekend\b", text)
+    if m:
+        start = today + timedelta(days=max(0, 5 - today.weekday()))
+        return start, 7 - start.weekday(), [m.span()]
+    return None, None, []
+
+def parse_window(text):
+    """
+    'after 6pm', 'before 10:00', 'between 5pm and 8pm', 'evening' ->
+    (start 'HH:MM' or None, end 'HH:MM' or None, matched spans).
+    """
+    m = re.search(rf"\bbetween {_TIME_RE} and {_TIME_RE}\b", text)
+    if m:
+        return parse_time(m.group(1))[0], parse_time(m.group(2))[0], [m.span()]
+    start = end = None
+    spans = []
+    m = re.search(rf"\b(?:after|from) {_TIME_RE}", text)
+    if m:
+        start = parse_time(m.group(1))[0]
+        spans.append(m.span())
+    m = re.search(rf"\b(?:before|until|till) {_TIME_RE}", text)
+    if m:
+        end = parse_time(m.group(1))[0]
+        spans.append(m.span())
+    if not spans:
+        m = re.search(r"\b(morning|afternoon|evening|night)s?\b", text)
+        if m:
+            start, end = DAY_PARTS[m.group(1)]
+            spans.append(m.span())
+    return start, end, spans
+
+def parse_limit(text):
+    m = re.search(r"\b(?:top|first|show|list)\s+(\d{1,2})\b", text) or \
+        re.search(r"\b(\d{1,2})\s+(?:closest |nearest |nearby )?(?:academies|academy|centres|centers|results|places)\b", text)
+    if m:
+        return int(m.group(1)), [m.span(1)]
+    return None, []
+
+def name_variants(name):
+    """The forms of an academy name a message may use: normalised full name and its distinctive ("core") part."""
+    full = _normalise(name)
+    core = " ".join(w for w in full.split() if w not in GENERIC_NAME_WORDS)
+    return {variant for variant in (full, core) if len(variant) >= 4}
+
+class NameMatcher:
+    """
+    Academy names prepared for match_academy_name: every name's variants, keyed
+    by variant. Build one per list of names (AcademyIndex.name_matcher caches it)
+    so matching costs a few lookups per message instead of a pass over every name.
+    """
+    def __init__(self, names):
+        self.variants = {}
+        self.longest = 0
+        for name in names:
+            for variant in name_variants(name):
+                self.variants.setdefault(variant, set()).add(name)
+                self.longest = max(self.longest, len(variant.split()))
+
+    def _names_for(self, variant):
+        # Overridden by the snapshot's matcher, which looks variants up in the mapped file.
+        return self.variants.get(variant)
+
+    def match(self, text):
+        words = [(m.start(), m.end()) for m in re.finditer(r"\S+", text)]
+        best = None
+        for i in range(len(words)):
+            for j in range(i, min(len(words), i + self.longest)):
+                start, end = words[i][0], words[j][1]
+                found = self._names_for(text[start:end])
+                if not found:
+                    continue
+                name = next(iter(found)) if len(found) == 1 else None
+                if best is None or end - start > best[2] - best[1]:
+                    best = (name, start, end)
+                elif end - start == best[2] - best[1] and name != best[0]:
+                    best = (None, start, end)  # Two academies fit equally well; let the LLM decide.
+        if best is None or best[0] is None:
+            return None, []
+        return best[0], [(best[1], best[2])]
+
+def match_academy_name(text, names):
+    """
+    Longest known academy name (or its distinctive part, without words like
+    'Academy') that appears in the message. `names` is a NameMatcher or a list
+    of names. Returns (name or None, matched spans).
+    """
+    matcher = names if isinstance(names, NameMatcher) else NameMatcher(names)
+    return matcher.match(text)
+
+def _has_any(text, phrases):
+    return any(re.search(rf"\b{re.escape(p)}\b", text) for p in phrases)
+
+def parse_message(message, today=None, known_names=()):
+    """
+    Deterministic intent/entity extraction with the same JSON shape as the LLM:
+    {"intent", "date", "time", "target_name", "limit"}, plus "days" and "end_time"
+    for next_available. Returns (result, confidence 0-1).
+    """
+    today = today or date.today()
+    text = _normalise(message)
+
+    req_date, date_spans = parse_date(text, today)
+    req_time, time_spans = parse_time(text)
+    limit, limit_spans = parse_limit(text)
+    target_name, name_spans = match_academy_name(text, known_names)
+    range_start, days, range_spans = parse_range(text, today)
+
+    counting = _has_any(text, COUNT_WORDS)
+    # "How many slots are free today?" asks about availability, not the academy total.
+    about_slots = _has_any(text, SLOT_WORDS) or req_date is not None
+    if counting and not target_name and not about_slots:
+        intent = "count_academies"
+    elif _has_any(text, ADDRESS_WORDS):
+        intent = "get_address"
+    elif _has_any(text, NEXT_WORDS) or range_spans:
+        intent = "next_available"
+    elif _has_any(text, SLOT_WORDS) or req_date:
+        intent = "check_slots"
+    else:
+        intent = "find_centres"
+
+    result = {
+        "intent": intent,
+        "date": req_date.strftime("%Y-%m-%d") if req_date else None,
+        "time": req_time,
+        "target_name": target_name,
+        "limit": limit,
+        "days": None,
+        "end_time": None,
+    }
+    extra_spans = []
+    if intent == "next_available":
+        # The time of day is a daily window here: "time" is its start, "end_time" its end.
+        window_start, window_end, window_spans = parse_window(text)
+        result["time"] = window_start if window_spans else req_time
+        result["end_time"] = window_end
+        if range_start and not req_date:
+            result["date"] = range_start.strftime("%Y-%m-%d")
+        result["days"] = days or NEXT_AVAILABLE_DAYS
+        extra_spans = range_spans + window_spans
+
+    # Blank out everything we understood; leftover words mean we may have missed something.
+    chars = list(text)
+    for start, end in date_spans + time_spans + limit_spans + name_spans + extra_spans:
+        chars[start:end] = " " * (end - start)
+    leftover = [w for w in re.split(r"[^a-z0-9]+", "".join(chars)) if w and w not in FILLER_WORDS]
+
+    confidence = 0.95
+    if leftover:
+        # Includes numbers no date/time/limit span explained, e.g. the "6" in "slots tomorrow at 6".
+        confidence = 0.5
+    if counting and intent != "count_academies":
+        confidence = min(confidence, 0.5)
+    if intent == "get_address" and not target_name:
+        confidence = min(confidence, 0.3)
+    if intent == "check_slots" and not req_date:
+        confidence = min(confidence, 0.4)
+    if intent == "find_centres" and not _has_any(text, FIND_WORDS):
+        confidence = min(confidence, 0.3)
+    return result, confidence
+
+# --- PATH COUNTERS ---
+_stats_lock = threading.Lock()
+path_stats = {"local": 0, "llm": 0, "fallback": 0, "shadow_agree": 0, "shadow_disagree": 0}
+
+def record_path(path):
+    with _stats_lock:
+        path_stats[path] += 1
+
+def get_path_stats():
+    with _stats_lock:
+        stats = dict(path_stats)
+    answered = stats["local"] + stats["llm"] + stats["fallback"]
+    stats["local_ratio"] = round(stats["local"] / answered, 4) if answered else 0.0
+    return stats
+
+def agrees(local, remote):
+    """Shadow-mode comparison on the fields the chat handlers branch on."""
+    def norm(value):
+        return str(value).strip().lower() if value not in (None, "") else None
+    return all(norm(local.get(k)) == norm(remote.get(k)) for k in ("intent", "date", "time", "target_name"))
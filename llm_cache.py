@@ -0,0 +1,159 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+
+def normalise_message(message):
+    # "  Check slots for TODAY " and "check slots for today" share one entry.
+    return " ".join(str(message).lower().split())
+
+class _InFlight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class IntentCache:
+    """
+    LRU + TTL cache for LLM intent results, with an optional SQLite file shared
+    by every worker on the machine. Concurrent misses for the same key wait for
+    the first caller instead of sending their own LLM request.
+    """
+    def __init__(self, max_entries=1024, ttl=3600, path=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self._stats = {"hits": 0, "disk_hits": 0, "misses": 0, "coalesced": 0, "evictions": 0}
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS intent_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)")
+            self._db_lock = threading.Lock()
+
+    @staticmethod
+    def make_key(message, today_str):
+        return f"{today_str}|{normalise_message(message)}"
+
+    def _get_memory(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at <= now:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _put_memory(self, key, value, expires_at):
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def _get_disk(self, key, now):
+        if self._db is None:
+            return None
+        with self._db_lock:
+            row = self._db.execute("SELECT value, expires_at FROM intent_cache WHERE key = ?", (key,)).fetchone()
+        if row is None or row[1] <= now:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def _put_disk(self, key, value, expires_at):
+        if self._db is None:
+            return
+        with self._db_lock:
+            self._db.execute("INSERT OR REPLACE INTO intent_cache (key, value, expires_at) VALUES (?, ?, ?)", (key, json.dumps(value), expires_at))
+            # Keep the shared file from growing forever.
+            self._db.execute("DELETE FROM intent_cache WHERE expires_at <= ?", (time.time(),))
+
+    def get(self, key):
+        # Expiry uses wall-clock time so entries mean the same thing across processes.
+        now = time.time()
+        with self._lock:
+            value = self._get_memory(key, now)
+            if value is not None:
+                self._stats["hits"] += 1
+                return dict(value)
+        found = self._get_disk(key, now)
+        if found is None:
+            return None
+        value, expires_at = found
+        with self._lock:
+            self._put_memory(key, value, expires_at)
+            self._stats["disk_hits"] += 1
+        return dict(value)
+
+    def set(self, key, value):
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._put_memory(key, value, expires_at)
+        self._put_disk(key, value, expires_at)
+
+    def get_or_compute(self, key, compute):
+        """
+        Cached value for `key`, or compute() it once even if many threads ask at the same time.
+        Exceptions from compute() reach every waiting caller and nothing is cached.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        with self._lock:
+            flight = self._in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._in_flight[key] = _InFlight()
+                self._stats["misses"] += 1
+            else:
+                self._stats["coalesced"] += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return dict(flight.result)
+
+        try:
+            flight.result = compute()
+            self.set(key, flight.result)
+            return dict(flight.result)
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            flight.done.set()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["disk_hits"] + stats["misses"] + stats["coalesced"]
+        stats["hit_ratio"] = round((lookups - stats["misses"]) / lookups, 4) if lookups else 0.0
+        return stats
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute("DELETE FROM intent_cache")
+
+# --- PROCESS-WIDE CACHE ---
+# INTENT_CACHE=0 turns caching off; INTENT_CACHE_PATH shares results between workers.
+intent_cache = None
+if os.environ.get("INTENT_CACHE", "1") != "0":
+    intent_cache = IntentCache(
+        max_entries=int(os.environ.get("INTENT_CACHE_SIZE", 1024)),
+        ttl=float(os.environ.get("INTENT_CACHE_TTL", 3600)),
+        path=os.environ.get("INTENT_CACHE_PATH"),
+    )
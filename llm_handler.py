@@ -1,50 +1,278 @@
 import os
 import json
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import date
-from groq import Groq
-import streamlit as st
+from metrics import timed
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from llm_cache import intent_cache, normalise_message
+from intent_parser import parse_message, record_path, agrees, MIN_CONFIDENCE
+from services.academy_index import get_academy_index
 
+logger = logging.getLogger(__name__)
+
+# "on": answer confident messages locally, "shadow": always ask the LLM but
+# count how often the local parser would have agreed, "off": LLM only.
+FAST_PATH_MODE = os.environ.get("INTENT_FAST_PATH", "on")
+
+# --- GROQ CLIENT, BUDGET AND BREAKER ---
+LLM_MODEL = "llama-3.3-70b-versatile"
+LLM_TIMEOUT = float(os.environ.get("LLM_TIMEOUT", 8))
+# Send a second identical request if the first has not answered after this many seconds (0 = never).
+LLM_HEDGE_AFTER = float(os.environ.get("LLM_HEDGE_AFTER", 0))
+# Most messages one batch completion may carry.
+LLM_BATCH_SIZE = int(os.environ.get("LLM_BATCH_SIZE", 20))
+
+breaker = CircuitBreaker(
+    "groq",
+    failure_threshold=int(os.environ.get("LLM_BREAKER_FAILURES", 5)),
+    reset_after=float(os.environ.get("LLM_BREAKER_RESET", 30)),
+)
+_attempt_pool = ThreadPoolExecutor(max_workers=int(os.environ.get("LLM_MAX_CONCURRENCY", 32)), thread_name_prefix="groq")
+_client = None
+_client_key = None
+_client_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_call_stats = {"calls": 0, "errors": 0, "timeouts": 0, "hedges": 0, "hedge_wins": 0}
+_latencies = deque(maxlen=1000)
+
+def _get_client(api_key):
+    # One client per process so HTTP keep-alive connections are reused between messages.
+    global _client, _client_key
+    with _client_lock:
+        if _client is None or _client_key != api_key:
+            # Imported here: the SDK is slow to import and not every process calls the LLM.
+            from groq import Groq
+            _client = Groq(
+                api_key=api_key,
+                base_url=os.environ.get("GROQ_BASE_URL") or None,
+                timeout=LLM_TIMEOUT,
+                max_retries=0,
+            )
+            _client_key = api_key
+        return _client
+
+def warm_up_client():
+    """Create the Groq client ahead of the first message. False when no API key is set."""
+    api_key = os.environ.get("GROQ_API_KEY")
+    if not api_key:
+        return False
+    _get_client(api_key)
+    return True
+
+def _count(name, amount=1):
+    with _stats_lock:
+        _call_stats[name] += amount
+
+def _complete(client, prompt, timeout):
+    return client.chat.completions.create(
+        # --- CRITICAL FIX: NEW MODEL NAME ---
+        model=LLM_MODEL,
+        messages=[{"role": "user", "content": prompt}],
+        temperature=0,
+        response_format={"type": "json_object"},
+        timeout=timeout,
+    )
+
+def _complete_within_budget(client, prompt):
+    """
+    Run the completion with a hard LLM_TIMEOUT deadline. With hedging on, a second
+    attempt starts when the first is slow (or fails early) and the first answer wins.
+    """
+    deadline = time.monotonic() + LLM_TIMEOUT
+    first = _attempt_pool.submit(_complete, client, prompt, LLM_TIMEOUT)
+    attempts = [first]
+    can_hedge = LLM_HEDGE_AFTER > 0
+    last_error = None
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            _count("timeouts")
+            raise TimeoutError(f"Groq did not answer within {LLM_TIMEOUT}s")
+        done, pending = wait(attempts, timeout=min(remaining, LLM_HEDGE_AFTER) if can_hedge else remaining, return_when=FIRST_COMPLETED)
+        for attempt in done:
+            if attempt.exception() is None:
+                if attempt is not first:
+                    _count("hedge_wins")
+                return attempt.result()
+            last_error = attempt.exception()
+        attempts = list(pending)
+        if can_hedge and (not done or not attempts):
+            can_hedge = False
+            _count("hedges")
+            attempts.append(_attempt_pool.submit(_complete, client, prompt, max(0.1, deadline - time.monotonic())))
+        elif not attempts:
+            raise last_error
+
+def llm_stats():
+    with _stats_lock:
+        stats = dict(_call_stats)
+        samples = sorted(_latencies)
+    if samples:
+        pick = lambda q: round(samples[min(len(samples) - 1, int(q * len(samples)))] * 1000, 1)
+        stats["latency_ms"] = {"p50": pick(0.5), "p90": pick(0.9), "p99": pick(0.99), "max": round(samples[-1] * 1000, 1)}
+    stats["breaker"] = breaker.snapshot()
+    return stats
+
+def _known_academy_names():
+    try:
+        return get_academy_index().name_matcher
+    except Exception:
+        return []
+
+def _build_prompt(today, query_section, output_rule):
+    today_str = today.strftime("%Y-%m-%d")
+    current_year = today.year
+
+    return f"""
+    You are a smart API. Extract JSON data.
+    CONTEXT: Current Date: {today_str}, Year: {current_year}
+
+    RULES:
+    - "count_academies": If user asks "how many", "total", "stats".
+    - "check_slots": If user asks for "slots" or a specific date.
+    - "get_address": If user asks for "address".
+    - "next_available": If user asks for the next/earliest free slot, or for anything free over several days ("this week", "next 3 days").
+    - "find_centres": Default/Fallback.
+
+    DATE RULES:
+    - Convert "24th April" to "{current_year}-04-24".
+    - For "next_available": "date" is the first day to search (null = today), "days" how many days to search
+      ("this week" = 7), and a time of day is a daily window: "time" its start and "end_time" its end
+      ("after 6pm" = "18:00" to null, "evening" = "17:00" to "22:00").
+
+    {query_section}
+
+    {output_rule}
+    """
+
+def _ask_groq_json(prompt, api_key):
+    # Before allow(): a failure here must not leave a half-open trial unrecorded.
+    client = _get_client(api_key)
+    breaker.allow()
+
+    started = time.monotonic()
+    _count("calls")
+    try:
+        completion = _complete_within_budget(client, prompt)
+        result = json.loads(completion.choices[0].message.content)
+    except Exception:
+        _count("errors")
+        breaker.record_failure()
+        raise
+    breaker.record_success()
+    with _stats_lock:
+        _latencies.append(time.monotonic() - started)
+    return result
+
+def _ask_groq(user_message, api_key, today):
+    prompt = _build_prompt(today, f'QUERY: "{user_message}"', "Return JSON object only.")
+    return _ask_groq_json(prompt, api_key)
+
+def _ask_groq_batch(user_messages, api_key, today):
+    """One completion for several messages; results come back in the same order."""
+    queries = "\n".join(f"{i + 1}. {json.dumps(m)}" for i, m in enumerate(user_messages))
+    prompt = _build_prompt(
+        today,
+        f"QUERIES:\n{queries}",
+        f'Return a JSON object {{"results": [...]}} with exactly {len(user_messages)} objects, one per query, in the same order.',
+    )
+    results = _ask_groq_json(prompt, api_key).get("results")
+    if not isinstance(results, list) or len(results) != len(user_messages) or not all(isinstance(r, dict) for r in results):
+        raise ValueError("Batch intent response did not match the number of queries")
+    return results
+
+def _local_fallback(local, user_message, today):
+    # Better than a blind "find_centres": use whatever the rule-based parser understood.
+    record_path("fallback")
+    if local is None:
+        local, _ = parse_message(user_message, today, _known_academy_names())
+    return local
+
+@timed("intent")
 def get_intent_and_entities(user_message):
+    today = date.today()
+    local, confidence = None, 0.0
+    if FAST_PATH_MODE != "off":
+        local, confidence = parse_message(user_message, today, _known_academy_names())
+        if FAST_PATH_MODE == "on" and confidence >= MIN_CONFIDENCE:
+            record_path("local")
+            return local
+
     try:
         api_key = os.environ.get("GROQ_API_KEY")
         if not api_key:
-            st.error("⚠️ Error: GROQ_API_KEY is missing.")
-            return {"intent": "find_centres", "limit": 5}
-            
-        client = Groq(api_key=api_key)
-        
-        today = date.today()
-        today_str = today.strftime("%Y-%m-%d")
-        current_year = today.year
-        
-        prompt = f"""
-        You are a smart API. Extract JSON data.
-        CONTEXT: Current Date: {today_str}, Year: {current_year}
-        
-        RULES:
-        - "count_academies": If user asks "how many", "total", "stats".
-        - "check_slots": If user asks for "slots" or a specific date.
-        - "get_address": If user asks for "address".
-        - "find_centres": Default/Fallback.
-        
-        DATE RULES:
-        - Convert "24th April" to "{current_year}-04-24".
-        
-        QUERY: "{user_message}"
-        
-        Return JSON object only.
-        """
-        
-        completion = client.chat.completions.create(
-            # --- CRITICAL FIX: NEW MODEL NAME ---
-            model="llama-3.3-70b-versatile",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0,
-            response_format={"type": "json_object"}
-        )
-        return json.loads(completion.choices[0].message.content)
-        
-    except Exception as e:
-        # This will show you the error in red box if it fails again
-        st.error(f"⚠️ AI BRAIN FAILURE: {str(e)}")
-        return {"intent": "find_centres", "limit": 5}
\ No newline at end of file
+            logger.error("GROQ_API_KEY is missing; using the local parser")
+            return _local_fallback(local, user_message, today)
+
+        if intent_cache is None:
+            result = _ask_groq(user_message, api_key, today)
+        else:
+            # The prompt embeds today's date, so cached answers are only valid for that day.
+            key = intent_cache.make_key(user_message, today.strftime("%Y-%m-%d"))
+            result = intent_cache.get_or_compute(key, lambda: _ask_groq(user_message, api_key, today))
+
+        record_path("llm")
+        if FAST_PATH_MODE == "shadow" and confidence >= MIN_CONFIDENCE:
+            record_path("shadow_agree" if agrees(local, result) else "shadow_disagree")
+        return result
+
+    except CircuitOpenError:
+        # Groq has been failing; don't make the user wait for another timeout.
+        return _local_fallback(local, user_message, today)
+
+    except Exception:
+        logger.exception("Intent extraction via Groq failed; using the local parser")
+        return _local_fallback(local, user_message, today)
+
+@timed("intent_batch")
+def get_intents_batch(user_messages):
+    """
+    Intent for every message, in order. Repeated messages are resolved once, confident
+    ones locally, cached ones from the cache, and the rest share LLM_BATCH_SIZE-message
+    completions. If a batch completion fails, its messages go through
+    get_intent_and_entities one by one.
+    """
+    today = date.today()
+    today_str = today.strftime("%Y-%m-%d")
+    unique = {}
+    for message in user_messages:
+        unique.setdefault(normalise_message(message), message)
+
+    names = _known_academy_names() if FAST_PATH_MODE == "on" else []
+    results, pending = {}, []
+    for key, message in unique.items():
+        if FAST_PATH_MODE == "on":
+            local, confidence = parse_message(message, today, names)
+            if confidence >= MIN_CONFIDENCE:
+                record_path("local")
+                results[key] = local
+                continue
+        cached = intent_cache.get(intent_cache.make_key(message, today_str)) if intent_cache else None
+        if cached is not None:
+            record_path("llm")
+            results[key] = cached
+            continue
+        pending.append((key, message))
+
+    api_key = os.environ.get("GROQ_API_KEY")
+    for i in range(0, len(pending), LLM_BATCH_SIZE):
+        chunk = pending[i:i + LLM_BATCH_SIZE]
+        try:
+            if not api_key:
+                raise RuntimeError("GROQ_API_KEY is missing.")
+            answers = _ask_groq_batch([message for _, message in chunk], api_key, today)
+        except Exception:
+            for key, message in chunk:
+                results[key] = get_intent_and_entities(message)
+            continue
+        for (key, message), answer in zip(chunk, answers):
+            record_path("llm")
+            results[key] = answer
+            if intent_cache is not None:
+                intent_cache.set(intent_cache.make_key(message, today_str), answer)
+
+    return [dict(results[normalise_message(message)]) for message in user_messages]
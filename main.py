@@ -1,12 +1,75 @@
-from fastapi import FastAPI
+import os
+import json
+import logging
+import time
+import asyncio
+import functools
+import contextvars
+import threading
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, PlainTextResponse, JSONResponse
 from pydantic import BaseModel
+from typing import List, Optional
 from datetime import datetime, timedelta
-from llm_handler import get_intent_and_entities
-from services.center_service import find_nearby_centres, find_centre_by_name, get_total_academy_count
-from services.slot_service import get_available_slots
+from llm_handler import get_intent_and_entities, get_intents_batch, llm_stats, warm_up_client
+from db_config import pool_stats, get_pool
+from llm_cache import intent_cache
+from intent_parser import get_path_stats
+from services.center_service import find_centre_by_name
+from services.search_service import nearby_centres, nearby_availability, academy_day_grid, academy_day_grids, next_openings, NEXT_AVAILABLE_DAYS, NEXT_AVAILABLE_MAX_DAYS, NEXT_AVAILABLE_CENTRES, nearest_page, decode_cursor, academy_count, invalidate_academy, invalidate_all, result_cache_stats
+from services.slot_grid import DayGrid
+from services.academy_index import refresh_academy_index, get_academy_index
+import metrics
 
-app = FastAPI()
+logger = logging.getLogger(__name__)
+
+# --- WARM-UP ---
+# WARM_UP=1 opens database connections, loads the academy index and creates the
+# Groq client in a background thread at startup, so the first chats don't pay for
+# it. /ready answers 503 until that has finished; load balancers should wait for it.
+WARM_UP = os.environ.get("WARM_UP", "0") == "1"
+WARM_UP_DB_CONNECTIONS = int(os.environ.get("WARM_UP_DB_CONNECTIONS", 2))
+warm_state = {"enabled": WARM_UP, "ready": not WARM_UP, "seconds": None, "steps": {}}
+
+def _warm_db_pool():
+    pool = get_pool()
+    conns = [pool.acquire() for _ in range(min(WARM_UP_DB_CONNECTIONS, pool.size))]
+    for conn in conns:
+        conn.close()
+    return f"{len(conns)} connections"
+
+def _warm_academy_index():
+    index = get_academy_index()
+    index.name_index  # built lazily on first name lookup otherwise
+    return f"{len(index)} academies"
+
+def _warm_llm_client():
+    return "ready" if warm_up_client() else "skipped: GROQ_API_KEY not set"
+
+def warm_up():
+    started = time.perf_counter()
+    for name, step in (("db_pool", _warm_db_pool), ("academy_index", _warm_academy_index), ("llm_client", _warm_llm_client)):
+        step_started = time.perf_counter()
+        try:
+            status = step()
+        except Exception as e:
+            # Not fatal: each service still falls back or retries on first use.
+            logger.exception("Warm-up step %s failed", name)
+            status = f"failed: {e}"
+        warm_state["steps"][name] = {"status": status, "ms": round((time.perf_counter() - step_started) * 1000, 1)}
+    warm_state["seconds"] = round(time.perf_counter() - started, 3)
+    warm_state["ready"] = True
+
+@asynccontextmanager
+async def lifespan(app):
+    if WARM_UP:
+        threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+    yield
+
+app = FastAPI(lifespan=lifespan)
 #
 app.add_middleware(
     CORSMiddleware,
@@ -16,12 +79,47 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# --- BLOCKING WORK OFF THE EVENT LOOP ---
+# Groq and mysql.connector are synchronous. Running them on a bounded pool keeps
+# one slow call from stalling every other chat served by this worker.
+io_executor = ThreadPoolExecutor(max_workers=int(os.environ.get("CHAT_IO_THREADS", 16)), thread_name_prefix="chat-io")
+
+async def run_blocking(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    # Carry the caller's context into the worker thread so stage timings land on its request.
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(io_executor, functools.partial(ctx.run, func, *args, **kwargs))
+
+# --- METRICS ---
+# Every /chat* request gets a metrics scope: stage timings and DB query counts are
+# collected on it and published to /metrics, labelled by intent, when it finishes.
+# SERVER_TIMING=1 also returns them in a Server-Timing header (not for /chat/stream,
+# whose headers go out before the work is done).
+SERVER_TIMING = os.environ.get("SERVER_TIMING", "0") == "1"
+
+METRIC_ENDPOINTS = {"/chat", "/chat/batch", "/chat/stream"}
+
+@app.middleware("http")
+async def request_metrics(request: Request, call_next):
+    # Only the chat routes, by exact path: the endpoint label must not grow with client input.
+    if not metrics.ENABLED or request.url.path not in METRIC_ENDPOINTS:
+        return await call_next(request)
+    with metrics.request_scope(request.url.path) as scope:
+        response = await call_next(request)
+        if SERVER_TIMING and request.url.path != "/chat/stream":
+            response.headers["Server-Timing"] = metrics.server_timing(scope)
+    return response
+
 class ChatRequest(BaseModel):
     message: str
     latitude: float
     longitude: float
+    # next_cursor from an earlier reply: returns the next page of that academy list.
+    cursor: Optional[str] = None
 
+@metrics.timed("format_time_ranges")
 def format_time_ranges(slots):
+    if isinstance(slots, DayGrid): return slots.format_ranges()
     if not slots: return "No slots"
     sorted_slots = sorted(slots, key=lambda x: x['raw_start'])
     if not sorted_slots: return ""
@@ -44,9 +142,142 @@ def format_time_ranges(slots):
     ranges.append(f"{range_start.strftime('%I:%M %p')} - {range_end.strftime('%I:%M %p')}")
     return ", ".join(ranges)
 
+@app.get("/ready")
+def readiness():
+    return JSONResponse(warm_state, status_code=200 if warm_state["ready"] else 503)
+
+@app.get("/db/pool")
+def db_pool_stats():
+    return pool_stats()
+
+@app.get("/intent/cache")
+def intent_cache_stats():
+    return intent_cache.stats() if intent_cache else {"enabled": False}
+
+@app.get("/intent/paths")
+def intent_path_stats():
+    return get_path_stats()
+
+@app.get("/llm/stats")
+def llm_call_stats():
+    return llm_stats()
+
+class InvalidateRequest(BaseModel):
+    academy_name: str
+    date: Optional[str] = None
+
+@app.get("/cache")
+def search_cache_stats():
+    return result_cache_stats()
+
+@app.post("/cache/invalidate")
+def invalidate_search_cache(req: InvalidateRequest):
+    # Booking systems call this after creating, moving or cancelling a booking. Other
+    # workers pick it up through RESULT_CACHE_INVALIDATION_PATH if set, else on TTL expiry.
+    return {"invalidated": invalidate_academy(req.academy_name, req.date)}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    pool = pool_stats()
+    gauges = {f"tida_db_pool_{key}": pool[key] for key in ("size", "open", "idle", "in_use")}
+    counters = {f"tida_db_pool_{key}_total": pool[key] for key in ("checkouts", "timeouts")}
+    return metrics.render_prometheus(gauges, counters)
+
+@app.post("/academies/refresh")
+def refresh_academies():
+    index = refresh_academy_index()
+    invalidate_all()
+    return {"academies": len(index)}
+
+def availability_block(c, grid, req_date, req_time):
+    """One centre's entry in a broad slot search, or None if the requested time is taken."""
+    dist = round(c['distance'], 1)
+    if req_time:
+        req_dt = datetime.strptime(f"{req_date} {req_time}", "%Y-%m-%d %H:%M")
+        match = grid.slot_at(req_dt)
+        if match:
+            return f"✅ **{c['post_title']}** ({dist} km)\n   • Open at **{match['display']}**"
+        return None
+    if grid.is_entirely_free():
+        return f"🟢 **{c['post_title']}** ({dist} km)\n   • Entire day available"
+    range_str = format_time_ranges(grid)
+    return f"🟡 **{c['post_title']}** ({dist} km)\n   • {range_str}"
+
+def is_broad_slot_search(req, ai_data):
+    # Mirrors the branch order in answer_message: a dated slot search with no academy named.
+    intent = ai_data.get("intent")
+    if intent == "count_academies" or intent == "get_address":
+        return False
+    target_name = ai_data.get("target_name")
+    if target_name and "address" in req.message.lower():
+        return False
+    if intent == "next_available":
+        return False
+    wants_slots = intent == "check_slots" or ai_data.get("date") or "slot" in req.message.lower()
+    return bool(wants_slots and ai_data.get("date") and not target_name)
+
 @app.post("/chat")
 async def chat_handler(req: ChatRequest):
-    ai_data = get_intent_and_entities(req.message)
+    # A "more results" request already knows what it wants; skip intent extraction.
+    ai_data = {"intent": "find_centres"} if req.cursor else await run_blocking(get_intent_and_entities, req.message)
+    metrics.set_intent(ai_data.get("intent"))
+    return await answer_message(req, ai_data)
+
+class BatchChatRequest(BaseModel):
+    requests: List[ChatRequest]
+
+CHAT_BATCH_MAX = int(os.environ.get("CHAT_BATCH_MAX", 100))
+
+def prefetch_batch(requests, intents):
+    """
+    Load the day grids every slot question in a batch will need with one query per
+    date, so the per-item answers below are served from the result cache.
+    """
+    names_by_date = {}
+    for req, ai_data in zip(requests, intents):
+        req_date = ai_data.get("date")
+        if not req_date:
+            continue
+        if ai_data.get("intent") == "next_available":
+            continue
+        if is_broad_slot_search(req, ai_data):
+            req_limit = ai_data.get("limit")
+            centres = nearby_centres(req.latitude, req.longitude, 60, int(req_limit) if req_limit else 5)
+            names = [c['post_title'] for c in centres]
+        elif ai_data.get("target_name") and ai_data.get("intent") != "get_address":
+            academy = find_centre_by_name(ai_data["target_name"])
+            names = [academy['post_title']] if academy else []
+        else:
+            continue
+        names_by_date.setdefault(req_date, []).extend(names)
+    for req_date, names in names_by_date.items():
+        academy_day_grids(names, req_date)
+
+@app.post("/chat/batch")
+async def chat_batch_handler(batch: BatchChatRequest):
+    if len(batch.requests) > CHAT_BATCH_MAX:
+        raise HTTPException(status_code=413, detail=f"At most {CHAT_BATCH_MAX} messages per batch")
+
+    metrics.set_intent("batch")
+    fresh = await run_blocking(get_intents_batch, [r.message for r in batch.requests if not r.cursor])
+    fresh = iter(fresh)
+    intents = [{"intent": "find_centres"} if r.cursor else next(fresh) for r in batch.requests]
+    try:
+        await run_blocking(prefetch_batch, batch.requests, intents)
+    except Exception:
+        # Not fatal: each item falls back to its own lookups and reports its own error.
+        logger.exception("Batch prefetch failed")
+
+    async def answer_one(req, ai_data):
+        try:
+            return await answer_message(req, ai_data)
+        except Exception as e:
+            return {"error": str(e)}
+
+    results = await asyncio.gather(*(answer_one(r, ai) for r, ai in zip(batch.requests, intents)))
+    return {"results": list(results)}
+
+async def answer_message(req, ai_data):
     intent = ai_data.get("intent")
     req_date = ai_data.get("date")
     req_time = ai_data.get("time") 
@@ -54,19 +285,25 @@ async def chat_handler(req: ChatRequest):
     req_limit = ai_data.get("limit")
     limit = int(req_limit) if req_limit else 5
 
+    if req.cursor:
+        return await answer_more(req)
+
     if intent == "count_academies":
-        count = get_total_academy_count()
+        count = await run_blocking(academy_count)
         return {"reply": f"📊 **System Status**\nActive Academies: **{count}**"}
 
     if intent == "get_address" or (target_name and "address" in req.message.lower()):
         if target_name and target_name.lower() in ['near me', 'nearby', 'closest']:
             target_name = None
         search_name = target_name if target_name else req.message
-        result = find_centre_by_name(search_name)
+        result = await run_blocking(find_centre_by_name, search_name)
         if result:
             return {"reply": f"📍 **{result['post_title']}**\n{result['address']}"}
         return {"reply": "❌ Academy not found. Try asking for 'academies near me'."}
 
+    if intent == "next_available":
+        return await answer_next_available(req, ai_data)
+
     if intent == "check_slots" or req_date or "slot" in req.message.lower():
         if not req_date:
             return {"reply": "📅 **Date Needed**\nPlease specify a date (e.g., Today, Tomorrow)."}
@@ -74,33 +311,34 @@ async def chat_handler(req: ChatRequest):
         pretty_date = datetime.strptime(req_date, "%Y-%m-%d").strftime("%A, %d %b")
 
         if target_name:
-            academy = find_centre_by_name(target_name)
+            academy = await run_blocking(find_centre_by_name, target_name)
             if not academy:
                 return {"reply": f"❌ Academy '**{target_name}**' not found."}
             
             # UPDATED: Passing 'post_title' (Name) instead of ID
-            free_slots = get_available_slots(academy['post_title'], req_date)
+            grid = await run_blocking(academy_day_grid, academy['post_title'], req_date)
             
             now = datetime.now()
             if req_date == now.strftime("%Y-%m-%d"):
-                free_slots = [s for s in free_slots if s['raw_start'] > now]
+                grid = grid.after(now)
 
-            if not free_slots:
+            if not grid.has_free():
                 return {"reply": f"❌ **{academy['post_title']}** is fully booked on {pretty_date}."}
 
             if req_time:
                 req_dt = datetime.strptime(f"{req_date} {req_time}", "%Y-%m-%d %H:%M")
-                match = next((s for s in free_slots if s['raw_start'].hour == req_dt.hour), None)
+                match = grid.slot_at(req_dt)
                 if match:
                     return {"reply": f"✅ **Available**\n{academy['post_title']} has a slot at **{match['display']}**."}
                 else:
                     return {"reply": f"❌ **Booked**\n{req_time} is taken at {academy['post_title']}."}
             else:
-                 time_str = format_time_ranges(free_slots)
+                 time_str = format_time_ranges(grid)
                  return {"reply": f"✅ **{academy['post_title']}**\n**Open:** {time_str}"}
 
         else:
-            centres = find_nearby_centres(req.latitude, req.longitude, radius=60, limit=limit)
+            # Nearby centres (cached per cell), then their day grids (cached per academy)
+            centres, grids = await run_blocking(nearby_availability, req.latitude, req.longitude, 60, limit, req_date)
             if not centres:
                 return {"reply": "🚫 No academies found within 60km."}
 
@@ -108,37 +346,162 @@ async def chat_handler(req: ChatRequest):
             report_blocks.append(f"### 🗓️ Availability for {pretty_date}\n")
             any_found = False
 
+            now = datetime.now()
+
             for c in centres:
                 # UPDATED: Passing 'post_title' (Name)
-                free_slots = get_available_slots(c['post_title'], req_date)
+                grid = grids[c['post_title']]
                 
-                now = datetime.now()
                 if req_date == now.strftime("%Y-%m-%d"):
-                    free_slots = [s for s in free_slots if s['raw_start'] > now]
+                    grid = grid.after(now)
 
-                if free_slots:
+                if grid.has_free():
                     any_found = True
-                    dist = round(c['distance'], 1)
-                    if req_time:
-                         req_dt = datetime.strptime(f"{req_date} {req_time}", "%Y-%m-%d %H:%M")
-                         match = next((s for s in free_slots if s['raw_start'].hour == req_dt.hour), None)
-                         if match:
-                             report_blocks.append(f"✅ **{c['post_title']}** ({dist} km)\n   • Open at **{match['display']}**")
-                    else:
-                        if len(free_slots) >= 18:
-                            report_blocks.append(f"🟢 **{c['post_title']}** ({dist} km)\n   • Entire day available")
-                        else:
-                            range_str = format_time_ranges(free_slots)
-                            report_blocks.append(f"🟡 **{c['post_title']}** ({dist} km)\n   • {range_str}")
+                    block = availability_block(c, grid, req_date, req_time)
+                    if block:
+                        report_blocks.append(block)
 
             if not any_found:
                  return {"reply": f"⚠️ Fully booked nearby for {pretty_date}."}
             return {"reply": "\n\n".join(report_blocks)}
 
-    centres = find_nearby_centres(req.latitude, req.longitude, radius=60, limit=limit)
+    # Nearest academies however far away they are, with a cursor for "more results".
+    centres, next_cursor = await run_blocking(nearest_page, req.latitude, req.longitude, limit)
     if not centres:
         return {"reply": "No academies found nearby."}
     
     header = f"Here are the **{len(centres)}** closest academies:\n\n"
     list_items = [f"📍 **{c['post_title']}**\n   {c['address']} ({round(c['distance'], 1)} km)" for c in centres]
-    return {"reply": header + "\n\n".join(list_items)}
\ No newline at end of file
+    return {"reply": header + "\n\n".join(list_items), "next_cursor": next_cursor}
+
+async def answer_more(req):
+    # The cursor carries the page size of the list it continues.
+    try:
+        centres, next_cursor = await run_blocking(nearest_page, req.latitude, req.longitude, None, req.cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not centres:
+        return {"reply": "That's every academy we know of.", "next_cursor": None}
+    list_items = [f"📍 **{c['post_title']}**\n   {c['address']} ({round(c['distance'], 1)} km)" for c in centres]
+    return {"reply": f"Here are **{len(centres)}** more academies:\n\n" + "\n\n".join(list_items), "next_cursor": next_cursor}
+
+# --- NEXT AVAILABLE ---
+# "When is the next free slot at X" / "anything free this week near me": the
+# earliest openings over a range of days, from one bookings query.
+
+def format_openings(openings):
+    lines = []
+    for o in openings:
+        dist = f" ({round(o['distance'], 1)} km)" if o['distance'] is not None else ""
+        lines.append(f"✅ **{o['post_title']}**{dist}\n   • {o['start'].strftime('%a, %d %b')} at **{o['display']}**")
+    return "\n\n".join(lines)
+
+async def answer_next_available(req, ai_data):
+    target_name = ai_data.get("target_name")
+    req_limit = ai_data.get("limit")
+    limit = int(req_limit) if req_limit else 5
+    start_date = ai_data.get("date") or datetime.now().strftime("%Y-%m-%d")
+    days = min(max(int(ai_data.get("days") or NEXT_AVAILABLE_DAYS), 1), NEXT_AVAILABLE_MAX_DAYS)
+
+    if target_name:
+        academy = await run_blocking(find_centre_by_name, target_name)
+        if not academy:
+            return {"reply": f"❌ Academy '**{target_name}**' not found."}
+        centres = [academy]
+    else:
+        centres = await run_blocking(nearby_centres, req.latitude, req.longitude, 60, max(limit, NEXT_AVAILABLE_CENTRES))
+        if not centres:
+            return {"reply": "🚫 No academies found within 60km."}
+
+    openings = await run_blocking(next_openings, centres, start_date, days, limit, ai_data.get("time"), ai_data.get("end_time"))
+    if not openings:
+        where = f"at **{centres[0]['post_title']}**" if target_name else "nearby"
+        return {"reply": f"⚠️ No free slots {where} in the next {days} days."}
+    if target_name:
+        times = "\n".join(f"   • {o['start'].strftime('%a, %d %b')} at **{o['display']}**" for o in openings)
+        return {"reply": f"### ⏭️ Next free slots at {openings[0]['post_title']}\n\n{times}"}
+    return {"reply": f"### ⏭️ Next available slots\n\n{format_openings(openings)}"}
+
+# --- STREAMING ---
+# Broad availability searches are sent as Server-Sent Events: the header and the
+# list of nearest centres first, then one block per group of centres as soon as
+# its bookings are loaded.
+STREAM_CHUNK_SIZE = int(os.environ.get("STREAM_CHUNK_SIZE", 3))
+
+def sse(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+async def stream_availability(req, ai_data):
+    req_date = ai_data.get("date")
+    req_time = ai_data.get("time")
+    req_limit = ai_data.get("limit")
+    limit = int(req_limit) if req_limit else 5
+    pretty_date = datetime.strptime(req_date, "%Y-%m-%d").strftime("%A, %d %b")
+
+    centres = await run_blocking(nearby_centres, req.latitude, req.longitude, 60, limit)
+    if not centres:
+        yield sse("block", {"text": "🚫 No academies found within 60km."})
+        return
+
+    yield sse("header", {
+        "text": f"### 🗓️ Availability for {pretty_date}\n",
+        "centres": [{"post_title": c['post_title'], "distance": round(c['distance'], 1)} for c in centres],
+    })
+
+    by_name = {c['post_title']: c for c in centres}
+    chunks = [[c['post_title'] for c in centres[i:i + STREAM_CHUNK_SIZE]] for i in range(0, len(centres), STREAM_CHUNK_SIZE)]
+    pending = [asyncio.ensure_future(run_blocking(academy_day_grids, names, req_date)) for names in chunks]
+    any_found = False
+    for next_done in asyncio.as_completed(pending):
+        grids = await next_done
+        now = datetime.now()
+        for name, grid in grids.items():
+            if req_date == now.strftime("%Y-%m-%d"):
+                grid = grid.after(now)
+            if grid.has_free():
+                any_found = True
+                block = availability_block(by_name[name], grid, req_date, req_time)
+                if block:
+                    yield sse("block", {"post_title": name, "text": block})
+
+    if not any_found:
+        yield sse("block", {"text": f"⚠️ Fully booked nearby for {pretty_date}."})
+
+@app.post("/chat/stream")
+async def chat_stream_handler(req: ChatRequest):
+    started = time.perf_counter()
+    if req.cursor:
+        # Reject a bad cursor now: once the stream has started the status is already 200.
+        try:
+            decode_cursor(req.cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    ai_data = {"intent": "find_centres"} if req.cursor else await run_blocking(get_intent_and_entities, req.message)
+    metrics.set_intent(ai_data.get("intent"))
+
+    async def events():
+        first_event_at = None
+        if is_broad_slot_search(req, ai_data):
+            parts = stream_availability(req, ai_data)
+        else:
+            parts = single_reply(req, ai_data)
+        async for part in parts:
+            if first_event_at is None:
+                first_event_at = time.perf_counter()
+            yield part
+        done_at = time.perf_counter()
+        # Server-side time to first event vs. total, for comparing against /chat.
+        yield sse("done", {
+            "ttfb_ms": round(((first_event_at or done_at) - started) * 1000, 1),
+            "total_ms": round((done_at - started) * 1000, 1),
+        })
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+async def single_reply(req, ai_data):
+    result = await answer_message(req, ai_data)
+    payload = {"text": result["reply"]}
+    if result.get("next_cursor"):
+        payload["next_cursor"] = result["next_cursor"]
+    yield sse("block", payload)
@@ -0,0 +1,164 @@
+"""
+Low-overhead latency instrumentation for the chat pipeline.
+
+Stages (LLM call, DB lookups, connection checkout, formatting) are timed with
+`timed`/`stage`. Inside a request scope the timings are collected on the request
+and folded into histograms, labelled by the request's intent, when it ends, so
+recording a stage is only a perf_counter() call and a list append. Outside a
+request (e.g. the Streamlit UI) they go straight into the histograms.
+"""
+import os
+import time
+import threading
+import functools
+import contextvars
+from contextlib import contextmanager
+
+ENABLED = os.environ.get("METRICS", "1") != "0"
+
+SECONDS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+# Label values must stay a small, fixed set; anything else the LLM invents is "other".
+KNOWN_INTENTS = {"count_academies", "check_slots", "get_address", "next_available", "find_centres", "batch", "unknown"}
+
+def _escape(value):
+    # Prometheus text format: backslash, double quote and newline are escaped in label values.
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+class Histogram:
+    def __init__(self, name, help_text, buckets, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.label_names = label_names
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            counts = series[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {labels: (list(s[0]), s[1], s[2]) for labels, s in self._series.items()}
+        for labels, (counts, total, count) in sorted(series.items()):
+            base = ",".join(f'{k}="{_escape(v)}"' for k, v in zip(self.label_names, labels))
+            running = 0
+            for bound, n in zip(self.buckets, counts):
+                running += n
+                lines.append(f'{self.name}_bucket{{{base},le="{bound}"}} {running}')
+            lines.append(f'{self.name}_bucket{{{base},le="+Inf"}} {count}')
+            lines.append(f"{self.name}_sum{{{base}}} {total}")
+            lines.append(f"{self.name}_count{{{base}}} {count}")
+        return lines
+
+STAGE_SECONDS = Histogram("tida_stage_seconds", "Time spent in each pipeline stage.", SECONDS_BUCKETS, ("stage", "intent"))
+REQUEST_SECONDS = Histogram("tida_request_seconds", "Chat request latency.", SECONDS_BUCKETS, ("endpoint", "intent"))
+REQUEST_DB_QUERIES = Histogram("tida_request_db_queries", "Database queries issued per chat request.", COUNT_BUCKETS, ("endpoint", "intent"))
+
+class RequestMetrics:
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.intent = "unknown"
+        self.stages = []
+        self.db_queries = 0
+        self.started = time.perf_counter()
+        self.closed = False
+
+_current = contextvars.ContextVar("request_metrics", default=None)
+
+def record_stage(name, seconds):
+    req = _current.get()
+    if req is None or req.closed:
+        # Outside a request, or work that outlived it (a streamed body): record now.
+        STAGE_SECONDS.observe(seconds, name, req.intent if req else "unknown")
+    else:
+        req.stages.append((name, seconds))
+
+@contextmanager
+def stage(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if ENABLED:
+            record_stage(name, time.perf_counter() - started)
+
+def timed(name):
+    """Decorator form of `stage`."""
+    def decorate(func):
+        if not ENABLED:
+            return func
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record_stage(name, time.perf_counter() - started)
+        return wrapper
+    return decorate
+
+def count_db_query():
+    req = _current.get()
+    if req is not None:
+        req.db_queries += 1
+
+def set_intent(intent):
+    req = _current.get()
+    if req is not None:
+        req.intent = intent if intent in KNOWN_INTENTS else "other"
+
+@contextmanager
+def request_scope(endpoint):
+    """Collect stage timings for one request; they are published when the block exits."""
+    req = RequestMetrics(endpoint)
+    token = _current.set(req)
+    try:
+        yield req
+    finally:
+        _current.reset(token)
+        if ENABLED:
+            _finish(req)
+
+def _finish(req):
+    req.closed = True
+    for name, seconds in req.stages:
+        STAGE_SECONDS.observe(seconds, name, req.intent)
+    REQUEST_SECONDS.observe(time.perf_counter() - req.started, req.endpoint, req.intent)
+    REQUEST_DB_QUERIES.observe(req.db_queries, req.endpoint, req.intent)
+
+def server_timing(req):
+    """Server-Timing header value: total milliseconds per stage, in first-seen order."""
+    totals = {}
+    for name, seconds in req.stages:
+        totals[name] = totals.get(name, 0.0) + seconds
+    parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in totals.items()]
+    parts.append(f"db;desc=queries;dur={req.db_queries}")
+    parts.append(f"total;dur={(time.perf_counter() - req.started) * 1000:.1f}")
+    return ", ".join(parts)
+
+def render_prometheus(gauges=None, counters=None):
+    """
+    Prometheus text exposition. `gauges` adds {name: value} lines such as pool sizes,
+    `counters` values that only ever grow (names should end in _total).
+    """
+    lines = []
+    for histogram in (STAGE_SECONDS, REQUEST_SECONDS, REQUEST_DB_QUERIES):
+        lines.extend(histogram.render())
+    for kind, values in (("gauge", gauges), ("counter", counters)):
+        for name, value in (values or {}).items():
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
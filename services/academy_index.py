@@ -0,0 +1,233 @@
+import math
+import os
+import threading
+import time
+import logging
+from db_config import get_db_connection
+from services.name_index import NameIndex
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371
+KM_PER_DEGREE = EARTH_RADIUS_KM * math.pi / 180
+CELL_DEGREES = float(os.environ.get("ACADEMY_INDEX_CELL_DEG", 0.5))
+REFRESH_SECONDS = float(os.environ.get("ACADEMY_INDEX_TTL", 300))
+# With a snapshot path, workers map the shared file (services/academy_snapshot.py)
+# instead of each loading the table; it is republished by refresh_academy_index().
+SNAPSHOT_PATH = os.environ.get("ACADEMY_SNAPSHOT_PATH")
+
+def load_academy_points():
+    """
+    Same rows as the SQL search: one per academy name from the academies table.
+    """
+    conn = get_db_connection()
+    try:
+        with conn.cursor(dictionary=True) as cursor:
+            cursor.execute("""
+            SELECT
+                id,
+                academy_name as post_title,
+                address,
+                latitude,
+                longitude
+            FROM academies
+            """)
+            return cursor.fetchall()
+    finally:
+        conn.close()
+
+def haversine_km(lat, lng, point_lat, point_lng):
+    # Mirrors the SQL expression (spherical law of cosines, clamped) so both paths agree.
+    cos_angle = (
+        math.cos(math.radians(lat)) * math.cos(math.radians(point_lat)) * math.cos(math.radians(point_lng) - math.radians(lng))
+        + math.sin(math.radians(lat)) * math.sin(math.radians(point_lat))
+    )
+    return EARTH_RADIUS_KM * math.acos(min(1.0, max(-1.0, cos_angle)))
+
+class AcademyIndex:
+    """
+    Lat/lng grid over academy centroids. A radius query only measures the
+    academies in cells overlapping the search box instead of every row.
+    """
+    def __init__(self, rows, cell_degrees=CELL_DEGREES):
+        self.cell_degrees = cell_degrees
+        self.columns = int(math.ceil(360 / cell_degrees))
+        self.ids = []
+        self.names = []
+        self.addresses = []
+        self.lats = []
+        self.lngs = []
+        self.cells = {}
+        self.loaded_at = time.monotonic()
+        self.located = []
+        for i, row in enumerate(rows):
+            self.ids.append(row.get("id"))
+            self.names.append(row["post_title"])
+            self.addresses.append(row["address"])
+            # Academies without coordinates can still be found by name, just not by distance.
+            if row["latitude"] is None or row["longitude"] is None:
+                self.lats.append(None)
+                self.lngs.append(None)
+                continue
+            self.lats.append(float(row["latitude"]))
+            self.lngs.append(float(row["longitude"]))
+            self.located.append(i)
+            self.cells.setdefault(self._cell(self.lats[i], self.lngs[i]), []).append(i)
+
+        self._name_index = None
+        self._name_matcher = None
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def name_index(self):
+        # Built on first use; a refresh creates a new AcademyIndex and so a fresh name index.
+        if self._name_index is None:
+            self._name_index = NameIndex(self.names)
+        return self._name_index
+
+    @property
+    def name_matcher(self):
+        # Names prepared for the local intent parser, built once per index like name_index.
+        if self._name_matcher is None:
+            from intent_parser import NameMatcher  # the parser imports the services, not the other way round
+            self._name_matcher = NameMatcher(self.names)
+        return self._name_matcher
+
+    def search_names(self, query, limit=5):
+        """
+        Ranked fuzzy name matches: [{"post_title", "address", "id", "score"}, ...].
+        """
+        results = []
+        for i, score in self.name_index.search_positions(query, limit):
+            results.append({"post_title": self.names[i], "address": self.addresses[i], "id": self.ids[i], "score": score})
+        return results
+
+    def _cell(self, lat, lng):
+        row = int(math.floor((lat + 90) / self.cell_degrees))
+        col = int(math.floor((lng + 180) / self.cell_degrees)) % self.columns
+        return row, col
+
+    def _candidates(self, lat, lng, radius, min_radius=0):
+        """
+        Academies in grid cells that may hold points closer than `radius`; with
+        `min_radius`, cells lying entirely closer than it are skipped.
+        """
+        lat_span = radius / KM_PER_DEGREE
+        max_abs_lat = min(90.0, abs(lat) + lat_span)
+        if max_abs_lat >= 89.0:
+            lng_span = 360.0
+        else:
+            lng_span = lat_span / math.cos(math.radians(max_abs_lat))
+        box_cells = (2 * lat_span / self.cell_degrees + 2) * (2 * lng_span / self.cell_degrees + 2)
+        if lng_span >= 180 or box_cells > len(self.located):
+            # Huge search box: a plain scan is cheaper than probing every cell.
+            return self.located
+
+        low_row, low_col = self._cell(max(-90.0, lat - lat_span), lng - lng_span)
+        high_row, _ = self._cell(min(90.0, lat + lat_span), lng + lng_span)
+        col_count = int(math.floor((lng + lng_span + 180) / self.cell_degrees)) - int(math.floor((lng - lng_span + 180) / self.cell_degrees)) + 1
+        # No point in a cell is further from its centre than half the cell's diagonal.
+        half_diagonal = self.cell_degrees * KM_PER_DEGREE * math.sqrt(2) / 2
+        candidates = []
+        for row in range(low_row, high_row + 1):
+            for step in range(col_count):
+                col = (low_col + step) % self.columns
+                if min_radius:
+                    centre_lat = (row + 0.5) * self.cell_degrees - 90
+                    centre_lng = (col + 0.5) * self.cell_degrees - 180
+                    if haversine_km(lat, lng, centre_lat, centre_lng) + half_diagonal < min_radius:
+                        continue
+                candidates.extend(self.cells.get((row, col), ()))
+        return candidates
+
+    def _result(self, i, distance):
+        return {
+            "post_title": self.names[i],
+            "address": self.addresses[i],
+            "latitude": self.lats[i],
+            "longitude": self.lngs[i],
+            "distance": distance,
+        }
+
+    def within(self, lat, lng, radius, limit, after=None):
+        """
+        Academies strictly closer than `radius` km, nearest first, at most `limit`.
+        `after` = (distance, name) of the last result already shown: only academies
+        ordered after it are returned.
+        """
+        lat, lng = float(lat), float(lng)
+        after_distance, after_name = after if after else (0.0, None)
+        hits = []
+        for i in self._candidates(lat, lng, radius, after_distance):
+            distance = haversine_km(lat, lng, self.lats[i], self.lngs[i])
+            if distance >= radius or distance < after_distance:
+                continue
+            if after is None or distance > after_distance or self.names[i] > after_name:
+                hits.append((distance, self.names[i], i))
+        hits.sort()
+        return [self._result(i, distance) for distance, _, i in hits[:limit]]
+
+    def nearest(self, lat, lng, k, start_radius=10, max_radius=math.pi * EARTH_RADIUS_KM, after=None):
+        """
+        k nearest academies with no radius cap: widen the search ring until k are
+        found. With `after`, the ring starts at that distance and the search
+        continues from there (the next page of results).
+        """
+        radius = min(start_radius + (after[0] if after else 0), max_radius)
+        while True:
+            hits = self.within(lat, lng, radius, k, after)
+            if len(hits) >= k or radius >= max_radius:
+                return hits
+            radius = min(radius * 2, max_radius)
+
+# --- PROCESS-WIDE INDEX ---
+_index = None
+_lock = threading.RLock()
+_refreshing = False
+
+def refresh_academy_index():
+    """Rebuild the index from the database now (and publish it, in snapshot mode)."""
+    global _index
+    if SNAPSHOT_PATH:
+        from services.academy_snapshot import publish_snapshot, current_snapshot_index
+        publish_snapshot(SNAPSHOT_PATH)
+        return current_snapshot_index(SNAPSHOT_PATH, force=True)
+    index = AcademyIndex(load_academy_points())
+    with _lock:
+        _index = index
+    return index
+
+def _refresh_in_background():
+    global _refreshing
+    try:
+        refresh_academy_index()
+    except Exception:
+        logger.exception("Academy index refresh failed; keeping previous snapshot")
+    finally:
+        _refreshing = False
+
+def get_academy_index():
+    """
+    Current index. The first call loads it; after REFRESH_SECONDS the old copy
+    keeps serving while a background thread rebuilds it. In snapshot mode it is
+    the newest published snapshot instead.
+    """
+    global _refreshing
+    if SNAPSHOT_PATH:
+        from services.academy_snapshot import current_snapshot_index
+        index = current_snapshot_index(SNAPSHOT_PATH)
+        if index is not None:
+            return index
+        # No snapshot yet: publish the first one.
+        with _lock:
+            return current_snapshot_index(SNAPSHOT_PATH, force=True) or refresh_academy_index()
+    index = _index
+    if index is None:
+        with _lock:
+            return _index if _index is not None else refresh_academy_index()
+    if time.monotonic() - index.loaded_at > REFRESH_SECONDS and not _refreshing:
+        _refreshing = True
+        threading.Thread(target=_refresh_in_background, daemon=True).start()
+    return index
@@ -0,0 +1,355 @@
+"""
+Academy data as a versioned binary snapshot that workers mmap instead of each
+building their own copy.
+
+Layout (little-endian, every section 8-byte aligned):
+    header        magic, format, counts, publish version, grid cell size
+    ids           int64[count]            (-1 when unknown)
+    lats, lngs    float64[count]          (NaN when the academy has no location)
+    flags         uint8[count]            (bit 0: address is NULL)
+    name_offsets, address_offsets         uint32[count + 1] into the string table
+    cell_keys     int64[cells]            grid cells, sorted (row * columns + col)
+    cell_starts   uint32[cells + 1]       into `order`
+    order         uint32[located]         academy positions grouped by cell
+    gram_keys     3 bytes[grams]          name trigrams, sorted
+    gram_starts   uint32[grams + 1]       into `postings`
+    postings      uint32[postings]        academy positions per trigram
+    name_gram_starts uint32[count + 1]    into `name_grams`
+    name_grams    uint32[postings]        trigram numbers (into gram_keys) per academy
+    variant_offsets uint32[variants + 1]  into the string table: name variants for the
+                                          local intent parser, sorted
+    variant_starts  uint32[variants + 1]  into `variant_names`
+    variant_names   uint32[variant_postings] academy positions per variant
+    strings       UTF-8 names, addresses and name variants
+
+Snapshots are written to a temporary file and os.replace()d into place, so a
+reader sees either the old file or the new one. Each worker re-stats the path at
+most every ACADEMY_SNAPSHOT_CHECK seconds and swaps to a new file when it
+changes; requests already holding the old index keep using the old mapping.
+
+Publish one from the database (e.g. from cron or a deploy step) with:
+
+    python -m services.academy_snapshot /var/lib/tida/academies.snap
+"""
+import bisect
+import logging
+import math
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from services.academy_index import AcademyIndex, CELL_DEGREES, load_academy_points
+from services.name_index import NameIndex, normalise_name, trigrams
+from intent_parser import NameMatcher, name_variants
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"TIDASNAP"
+FORMAT = 2
+# magic, format, count, version, cell_degrees, located, cells, grams, postings,
+# variants, variant_postings, longest variant (in words)
+HEADER = struct.Struct("<8sIIQdIIIIIII")
+CHECK_SECONDS = float(os.environ.get("ACADEMY_SNAPSHOT_CHECK", 2))
+
+def _aligned(size):
+    return (size + 7) & ~7
+
+def _sections(count, located, cells, grams, postings, variants, variant_postings):
+    # (name, format, length) in file order; "s" sections are raw bytes.
+    return [
+        ("ids", "q", count),
+        ("lats", "d", count),
+        ("lngs", "d", count),
+        ("flags", "B", count),
+        ("name_offsets", "I", count + 1),
+        ("address_offsets", "I", count + 1),
+        ("cell_keys", "q", cells),
+        ("cell_starts", "I", cells + 1),
+        ("order", "I", located),
+        ("gram_keys", "s", 3 * grams),
+        ("gram_starts", "I", grams + 1),
+        ("postings", "I", postings),
+        ("name_gram_starts", "I", count + 1),
+        ("name_grams", "I", postings),
+        ("variant_offsets", "I", variants + 1),
+        ("variant_starts", "I", variants + 1),
+        ("variant_names", "I", variant_postings),
+    ]
+
+def write_snapshot(rows, path, version=None, cell_degrees=CELL_DEGREES):
+    """
+    Write academy rows (as returned by load_academy_points) to `path` atomically.
+    Returns the snapshot's version.
+    """
+    index = AcademyIndex(rows, cell_degrees)
+    names = NameIndex(index.names)
+    version = version or time.time_ns()
+    count = len(index)
+
+    positions_by_variant = {}
+    for i, name in enumerate(index.names):
+        for variant in name_variants(name):
+            positions_by_variant.setdefault(variant, []).append(i)
+    variant_keys = sorted(positions_by_variant)
+    variant_names, variant_starts = [], []
+    for variant in variant_keys:
+        variant_starts.append(len(variant_names))
+        variant_names.extend(positions_by_variant[variant])
+    variant_starts.append(len(variant_names))
+    longest = max((len(v.split()) for v in variant_keys), default=0)
+
+    blob, name_offsets, address_offsets, variant_offsets = bytearray(), [], [], []
+    for offsets, values in ((name_offsets, index.names), (address_offsets, index.addresses), (variant_offsets, variant_keys)):
+        for value in values:
+            offsets.append(len(blob))
+            blob += (value or "").encode("utf-8")
+        offsets.append(len(blob))
+
+    cell_keys = sorted(row * index.columns + col for row, col in index.cells)
+    order, cell_starts = [], []
+    for key in cell_keys:
+        cell_starts.append(len(order))
+        order.extend(index.cells[divmod(key, index.columns)])
+    cell_starts.append(len(order))
+
+    gram_keys = sorted(names.postings)
+    postings, gram_starts = [], []
+    for gram in gram_keys:
+        gram_starts.append(len(postings))
+        postings.extend(names.postings[gram])
+    gram_starts.append(len(postings))
+    gram_numbers = {gram: n for n, gram in enumerate(gram_keys)}
+    name_grams, name_gram_starts = [], []
+    for grams in names.grams:
+        name_gram_starts.append(len(name_grams))
+        name_grams.extend(sorted(gram_numbers[gram] for gram in grams))
+    name_gram_starts.append(len(name_grams))
+
+    columns = {
+        "ids": [-1 if i is None else int(i) for i in index.ids],
+        "lats": [math.nan if v is None else v for v in index.lats],
+        "lngs": [math.nan if v is None else v for v in index.lngs],
+        "flags": [1 if a is None else 0 for a in index.addresses],
+        "name_offsets": name_offsets,
+        "address_offsets": address_offsets,
+        "cell_keys": cell_keys,
+        "cell_starts": cell_starts,
+        "order": order,
+        "gram_keys": "".join(gram_keys).encode("ascii"),
+        "gram_starts": gram_starts,
+        "postings": postings,
+        "name_gram_starts": name_gram_starts,
+        "name_grams": name_grams,
+        "variant_offsets": variant_offsets,
+        "variant_starts": variant_starts,
+        "variant_names": variant_names,
+    }
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        header = HEADER.pack(MAGIC, FORMAT, count, version, cell_degrees, len(order), len(cell_keys), len(gram_keys),
+                             len(postings), len(variant_keys), len(variant_names), longest)
+        f.write(header + b"\0" * (_aligned(len(header)) - len(header)))
+        for name, fmt, length in _sections(count, len(order), len(cell_keys), len(gram_keys), len(postings),
+                                           len(variant_keys), len(variant_names)):
+            data = columns[name] if fmt == "s" else struct.pack(f"<{length}{fmt}", *columns[name])
+            f.write(data + b"\0" * (_aligned(len(data)) - len(data)))
+        f.write(bytes(blob))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return version
+
+def publish_snapshot(path):
+    """Export the academies table to a new snapshot at `path`."""
+    return write_snapshot(load_academy_points(), path)
+
+class _Strings:
+    """Read-only sequence of strings decoded from the string table on access."""
+    def __init__(self, blob, offsets, flags=None):
+        self._blob = blob
+        self._offsets = offsets
+        self._flags = flags
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        if self._flags is not None and self._flags[i] & 1:
+            return None
+        return str(self._blob[self._offsets[i]:self._offsets[i + 1]], "utf-8")
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+class _Ids:
+    def __init__(self, values):
+        self._values = values
+
+    def __len__(self):
+        return len(self._values)
+
+    def __getitem__(self, i):
+        value = self._values[i]
+        return None if value < 0 else value
+
+class _GramKeys:
+    def __init__(self, raw):
+        self._raw = raw
+
+    def __len__(self):
+        return len(self._raw) // 3
+
+    def __getitem__(self, i):
+        return str(self._raw[3 * i:3 * i + 3], "ascii")
+
+class _Cells:
+    """Grid cells looked up by binary search over the sorted cell keys."""
+    def __init__(self, keys, starts, order, columns):
+        self._keys = keys
+        self._starts = starts
+        self._order = order
+        self._columns = columns
+
+    def __len__(self):
+        return len(self._keys)
+
+    def get(self, cell, default=()):
+        key = cell[0] * self._columns + cell[1]
+        at = bisect.bisect_left(self._keys, key)
+        if at == len(self._keys) or self._keys[at] != key:
+            return default
+        return self._order[self._starts[at]:self._starts[at + 1]]
+
+class SnapshotNameIndex(NameIndex):
+    """
+    NameIndex over the snapshot's trigram tables. Trigrams are compared by number,
+    so names are only decoded to confirm an exact match and for the final ranking.
+    """
+    def __init__(self, names, gram_keys, gram_starts, postings, name_gram_starts, name_grams):
+        self.names = names
+        self._gram_keys = gram_keys
+        self._gram_starts = gram_starts
+        self._postings = postings
+        self._name_gram_starts = name_gram_starts
+        self._name_grams = name_grams
+        self.common_gram_limit = max(50, len(names) // 20)
+
+    def _gram_number(self, gram):
+        at = bisect.bisect_left(self._gram_keys, gram)
+        return at if at < len(self._gram_keys) and self._gram_keys[at] == gram else None
+
+    def _posting(self, gram):
+        n = self._gram_number(gram)
+        return () if n is None else self._postings[self._gram_starts[n]:self._gram_starts[n + 1]]
+
+    def _query_keys(self, query_grams):
+        return {n for n in map(self._gram_number, query_grams) if n is not None}
+
+    def _overlap(self, i, keys):
+        return len(keys.intersection(self._name_grams[self._name_gram_starts[i]:self._name_gram_starts[i + 1]]))
+
+    def _gram_count(self, i):
+        return self._name_gram_starts[i + 1] - self._name_gram_starts[i]
+
+    def _is_exact(self, i, wanted, common):
+        # Equal names have equal trigram sets, so most candidates never need decoding.
+        return common == self._gram_count(i) == len(trigrams(wanted)) and normalise_name(self.names[i]) == wanted
+
+class SnapshotNameMatcher(NameMatcher):
+    """
+    NameMatcher over the snapshot's sorted variant table, so workers share it
+    through the page cache instead of each holding a dict of every name.
+    """
+    def __init__(self, names, variants, starts, positions, longest):
+        self.names = names
+        self.variants = variants
+        self._starts = starts
+        self._positions = positions
+        self.longest = longest
+
+    def _names_for(self, variant):
+        at = bisect.bisect_left(self.variants, variant)
+        if at == len(self.variants) or self.variants[at] != variant:
+            return None
+        return {self.names[i] for i in self._positions[self._starts[at]:self._starts[at + 1]]}
+
+class SnapshotIndex(AcademyIndex):
+    """
+    AcademyIndex backed by a memory-mapped snapshot: the same queries, with the
+    arrays read straight from the shared page cache.
+    """
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+        magic, fmt, count, version, cell_degrees, located, cells, grams, postings, variants, variant_postings, longest = HEADER.unpack_from(view)
+        if magic != MAGIC or fmt != FORMAT:
+            raise ValueError(f"{path} is not a format {FORMAT} academy snapshot")
+
+        offset = _aligned(HEADER.size)
+        sections = {}
+        for name, code, length in _sections(count, located, cells, grams, postings, variants, variant_postings):
+            size = length * (1 if code == "s" else struct.calcsize(code))
+            raw = view[offset:offset + size]
+            sections[name] = raw if code in ("s", "B") else raw.cast(code)
+            offset += _aligned(size)
+        blob = view[offset:]
+
+        self.path = path
+        self.version = version
+        self.cell_degrees = cell_degrees
+        self.columns = int(math.ceil(360 / cell_degrees))
+        self.loaded_at = time.monotonic()
+        self.ids = _Ids(sections["ids"])
+        self.lats = sections["lats"]
+        self.lngs = sections["lngs"]
+        self.names = _Strings(blob, sections["name_offsets"])
+        self.addresses = _Strings(blob, sections["address_offsets"], sections["flags"])
+        self.located = sections["order"]
+        self.cells = _Cells(sections["cell_keys"], sections["cell_starts"], sections["order"], self.columns)
+        self._name_index = SnapshotNameIndex(self.names, _GramKeys(sections["gram_keys"]),
+                                             sections["gram_starts"], sections["postings"],
+                                             sections["name_gram_starts"], sections["name_grams"])
+        self._name_matcher = SnapshotNameMatcher(self.names, _Strings(blob, sections["variant_offsets"]),
+                                                 sections["variant_starts"], sections["variant_names"], longest)
+
+    def __len__(self):
+        return len(self.ids)
+
+# --- PER-WORKER VIEW ---
+_current = None  # (file identity, SnapshotIndex)
+_checked_at = 0.0
+_lock = threading.Lock()
+
+def current_snapshot_index(path, force=False):
+    """
+    The newest snapshot at `path`, or None if there is none yet. A broken or
+    missing file keeps the previously mapped version in service.
+    """
+    global _current, _checked_at
+    now = time.monotonic()
+    if not force and _current is not None and now - _checked_at < CHECK_SECONDS:
+        return _current[1]
+    with _lock:
+        _checked_at = now
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return _current[1] if _current else None
+        identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if _current is None or _current[0] != identity:
+            try:
+                _current = (identity, SnapshotIndex(path))
+                logger.info("Mapped academy snapshot %s version %s", path, _current[1].version)
+            except Exception:
+                logger.exception("Could not map academy snapshot %s", path)
+                return _current[1] if _current else None
+        return _current[1]
+
+if __name__ == "__main__":
+    target = sys.argv[1] if len(sys.argv) > 1 else os.environ.get("ACADEMY_SNAPSHOT_PATH")
+    if not target:
+        sys.exit("usage: python -m services.academy_snapshot PATH (or set ACADEMY_SNAPSHOT_PATH)")
+    print(f"Published {target} version {publish_snapshot(target)}")
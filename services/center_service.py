@@ -1,29 +1,47 @@
+import os
+import logging
 from db_config import get_db_connection
+from metrics import timed
+from services.academy_index import get_academy_index
 
+logger = logging.getLogger(__name__)
+
+# Set ACADEMY_INDEX=0 to always run the distance search in MySQL.
+USE_ACADEMY_INDEX = os.environ.get("ACADEMY_INDEX", "1") != "0"
+
+@timed("find_nearby_centres")
 def find_nearby_centres(lat, lng, radius=60, limit=5): 
+    safe_limit = int(limit) if limit else 5
+    if USE_ACADEMY_INDEX:
+        try:
+            return get_academy_index().within(lat, lng, radius, safe_limit)
+        except Exception:
+            logger.exception("Academy index unavailable, falling back to SQL search")
+    return find_nearby_centres_sql(lat, lng, radius, safe_limit)
+
+def find_nearby_centres_sql(lat, lng, radius=60, limit=5):
     conn = get_db_connection()
     try:
         with conn.cursor(dictionary=True) as cursor:
             safe_limit = int(limit) if limit else 5
             
-            # UPDATED: Group BY NAME ONLY. 
-            # We take the first address and average location to merge duplicates.
+            # One row per academy in the slim 'academies' table (see db_migrations.py),
+            # so there is no GROUP BY over booking rows any more.
             query = """
             SELECT 
                 academy_name as post_title,
-                MIN(address) as address, 
-                AVG(latitude) as latitude,
-                AVG(longitude) as longitude,
+                address, 
+                latitude,
+                longitude,
                 (
                     6371 * acos(
                         LEAST(1.0, GREATEST(-1.0,
-                            cos(radians(%s)) * cos(radians(AVG(latitude))) * cos(radians(AVG(longitude)) - radians(%s)) + 
-                            sin(radians(%s)) * sin(radians(AVG(latitude)))
+                            cos(radians(%s)) * cos(radians(latitude)) * cos(radians(longitude) - radians(%s)) + 
+                            sin(radians(%s)) * sin(radians(latitude))
                         ))
                     )
                 ) AS distance
-            FROM academy_master 
-            GROUP BY academy_name
+            FROM academies 
             HAVING distance < %s
             ORDER BY distance ASC
             LIMIT %s; 
@@ -32,14 +50,79 @@ def find_nearby_centres(lat, lng, radius=60, limit=5):
             return cursor.fetchall()
     finally:
         conn.close()
+@timed("find_nearest_centres")
+def find_nearest_centres(lat, lng, limit=5, after=None, max_radius=None):
+    """
+    The `limit` nearest academies, however far: the search ring grows until enough
+    are found (up to `max_radius` km, if given). `after` = (distance, name) of the
+    last academy already shown continues the list from there.
+    """
+    safe_limit = int(limit) if limit else 5
+    if USE_ACADEMY_INDEX:
+        try:
+            index = get_academy_index()
+            if max_radius:
+                return index.nearest(lat, lng, safe_limit, max_radius=max_radius, after=after)
+            return index.nearest(lat, lng, safe_limit, after=after)
+        except Exception:
+            logger.exception("Academy index unavailable, falling back to SQL search")
+    return find_nearest_centres_sql(lat, lng, safe_limit, after, max_radius)
+
+def find_nearest_centres_sql(lat, lng, limit=5, after=None, max_radius=None):
+    conn = get_db_connection()
+    try:
+        with conn.cursor(dictionary=True) as cursor:
+            after_distance, after_name = after if after else (-1.0, "")
+            query = """
+            SELECT 
+                academy_name as post_title,
+                address, 
+                latitude,
+                longitude,
+                (
+                    6371 * acos(
+                        LEAST(1.0, GREATEST(-1.0,
+                            cos(radians(%s)) * cos(radians(latitude)) * cos(radians(longitude) - radians(%s)) + 
+                            sin(radians(%s)) * sin(radians(latitude))
+                        ))
+                    )
+                ) AS distance
+            FROM academies 
+            WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+            HAVING distance < %s AND (distance > %s OR (distance = %s AND post_title > %s))
+            ORDER BY distance ASC, post_title ASC
+            LIMIT %s; 
+            """
+            cursor.execute(query, (lat, lng, lat, max_radius or 1e9, after_distance, after_distance, after_name, limit))
+            return cursor.fetchall()
+    finally:
+        conn.close()
+
 def find_centre_by_name(name_query):
+    """
+    Best fuzzy match for a (possibly misspelt or partial) academy name, or None.
+    """
+    matches = find_centres_by_name(name_query, limit=1)
+    return matches[0] if matches else None
+
+@timed("find_centres_by_name")
+def find_centres_by_name(name_query, limit=5):
+    if USE_ACADEMY_INDEX:
+        try:
+            return get_academy_index().search_names(name_query, limit)
+        except Exception:
+            logger.exception("Academy index unavailable, falling back to SQL name lookup")
+    result = find_centre_by_name_sql(name_query)
+    return [result] if result else []
+
+def find_centre_by_name_sql(name_query):
     conn = get_db_connection()
     try:
         with conn.cursor(dictionary=True) as cursor:
-            # Simple lookup in the master table
+            # Simple lookup in the academies table
             query = """
-            SELECT DISTINCT academy_name as post_title, address, id
-            FROM academy_master
+            SELECT academy_name as post_title, address, id
+            FROM academies
             WHERE academy_name LIKE %s
             LIMIT 1
             """
@@ -48,11 +131,13 @@ def find_centre_by_name(name_query):
     finally:
         conn.close()
 
+@timed("get_total_academy_count")
 def get_total_academy_count():
     conn = get_db_connection()
     try:
         with conn.cursor() as cursor:
-            cursor.execute("SELECT COUNT(DISTINCT academy_name) FROM academy_master")
+            # Maintained by triggers (db_migrations.py), so this is a single-row read.
+            cursor.execute("SELECT academy_count FROM academy_stats WHERE id = 1")
             result = cursor.fetchone()
             return result[0] if result else 0
     finally:
@@ -0,0 +1,85 @@
+import re
+
+def normalise_name(text):
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", str(text).lower()).split())
+
+def trigrams(text):
+    padded = f"  {normalise_name(text)} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class NameIndex:
+    """
+    Trigram index over academy names for ranked fuzzy lookup.
+    Tolerates typos ("sunrize") and partial names ("sunrise" for
+    "Sunrise Tennis Academy"), and still finds the academy when the query is a
+    whole sentence that mentions it.
+    """
+    def __init__(self, names):
+        self.names = list(names)
+        self.normalised = [normalise_name(n) for n in self.names]
+        self.grams = []
+        self.postings = {}
+        for i, name in enumerate(self.names):
+            grams = trigrams(name)
+            self.grams.append(grams)
+            for gram in grams:
+                self.postings.setdefault(gram, []).append(i)
+        # Trigrams such as "ten" or "aca" appear in most names; they are still
+        # scored but too common to be worth walking when collecting candidates.
+        self.common_gram_limit = max(50, len(self.names) // 20)
+
+    def _posting(self, gram):
+        return self.postings.get(gram, ())
+
+    def _query_keys(self, query_grams):
+        # Whatever _overlap() intersects a name's trigrams with.
+        return query_grams
+
+    def _overlap(self, i, keys):
+        return len(keys & self.grams[i])
+
+    def _gram_count(self, i):
+        return len(self.grams[i])
+
+    def _is_exact(self, i, wanted, common):
+        return self.normalised[i] == wanted
+
+    def search_positions(self, query, limit=5, min_score=0.45):
+        """
+        [(position, score)] best first; score is 1.0 for an exact (normalised) match.
+        """
+        wanted = normalise_name(query)
+        query_grams = trigrams(query)
+        if not wanted or not query_grams:
+            return []
+
+        postings = {g: self._posting(g) for g in query_grams}
+        # Grams in no name (typos) must not count as rare, or they leave no candidates at all.
+        rare = [g for g in query_grams if 0 < len(postings[g]) <= self.common_gram_limit]
+        candidates = set()
+        for gram in rare or query_grams:
+            candidates.update(postings[gram])
+
+        keys = self._query_keys(query_grams)
+        scored = []
+        for i in candidates:
+            common = self._overlap(i, keys)
+            name_count = self._gram_count(i)
+            if self._is_exact(i, wanted, common):
+                score = 1.0
+            else:
+                # Containment either way covers partial names and long sentences;
+                # the Dice term prefers names of similar length to the query.
+                containment = max(common / len(query_grams), common / name_count)
+                dice = 2 * common / (len(query_grams) + name_count)
+                score = min(0.99, round(0.7 * containment + 0.3 * dice, 4))
+            if score >= min_score:
+                scored.append((-score, self.names[i], i))
+        scored.sort()
+        return [(i, -neg_score) for neg_score, _, i in scored[:limit]]
+
+    def search(self, query, limit=5, min_score=0.45):
+        """
+        [(name, score)] best first.
+        """
+        return [(self.names[i], score) for i, score in self.search_positions(query, limit, min_score)]
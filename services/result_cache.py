@@ -0,0 +1,118 @@
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+
+class ResultCache:
+    """
+    Small TTL + LRU cache for search results. Entries can carry tags such as
+    ("academy", name, date) so a booking change drops exactly the results it affects.
+    Cached values are shared between callers and must be treated as read-only.
+    """
+    def __init__(self, max_entries=2048, ttl=60.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._tags = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    def _drop(self, key):
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > time.monotonic():
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return entry[0]
+            if entry is not None:
+                self._drop(key)
+            self._stats["misses"] += 1
+            return None
+
+    def set(self, key, value, tags=(), ttl=None):
+        tags = tuple(tags)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (value, time.monotonic() + (ttl or self.ttl), tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self._stats["evictions"] += 1
+
+    def get_or_compute(self, key, compute, tags=lambda value: (), ttl=None):
+        """`tags` receives the computed value, since what a result touches is known only afterwards."""
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.set(key, value, tags(value), ttl)
+        return value
+
+    def invalidate_tag(self, tag):
+        with self._lock:
+            keys = list(self._tags.get(tag, ()))
+            for key in keys:
+                self._drop(key)
+            self._stats["invalidations"] += len(keys)
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        return stats
+
+class InvalidationLog:
+    """
+    Invalidations shared between workers through a SQLite file, like the intent
+    cache's. Each worker appends what it drops and, at most every `poll_seconds`,
+    replays what the others appended into its own ResultCache.
+    """
+    def __init__(self, path, cache, poll_seconds=1.0, keep_seconds=3600.0):
+        self.cache = cache
+        self.poll_seconds = poll_seconds
+        self.keep_seconds = keep_seconds
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS invalidations (seq INTEGER PRIMARY KEY AUTOINCREMENT, tag TEXT, created_at REAL NOT NULL)")
+        self._lock = threading.Lock()
+        # A new worker starts with an empty cache, so older entries don't concern it.
+        self._seen = self._db.execute("SELECT COALESCE(MAX(seq), 0) FROM invalidations").fetchone()[0]
+        self._polled_at = time.monotonic()
+
+    def publish(self, tag=None):
+        """Record an invalidation of `tag` (None = everything) for the other workers."""
+        with self._lock:
+            self._db.execute("INSERT INTO invalidations (tag, created_at) VALUES (?, ?)",
+                             (None if tag is None else json.dumps(tag), time.time()))
+            self._db.execute("DELETE FROM invalidations WHERE created_at < ?", (time.time() - self.keep_seconds,))
+
+    def poll(self):
+        now = time.monotonic()
+        if now - self._polled_at < self.poll_seconds:
+            return
+        with self._lock:
+            self._polled_at = now
+            rows = self._db.execute("SELECT seq, tag FROM invalidations WHERE seq > ? ORDER BY seq", (self._seen,)).fetchall()
+            for seq, tag in rows:
+                self._seen = seq
+                if tag is None:
+                    self.cache.clear()
+                else:
+                    self.cache.invalidate_tag(tuple(json.loads(tag)))
@@ -0,0 +1,297 @@
+import os
+import json
+import math
+import base64
+from datetime import datetime, timedelta
+from services.center_service import find_nearby_centres, find_nearest_centres, get_total_academy_count
+from services.slot_service import get_day_grid, get_day_grids, get_range_grids
+from services.result_cache import ResultCache, InvalidationLog
+from services.academy_index import haversine_km
+
+# Searches are cached per geohash cell (precision 6 is roughly 1.2 x 0.6 km): the
+# cell stores every academy that could be a result anywhere inside it, and each
+# request measures, filters and orders those from the user's own position.
+GEOHASH_PRECISION = int(os.environ.get("RESULT_CACHE_GEOHASH_PRECISION", 6))
+
+# RESULT_CACHE=0 disables caching; results are then computed from the exact location.
+result_cache = None
+if os.environ.get("RESULT_CACHE", "1") != "0":
+    result_cache = ResultCache(
+        max_entries=int(os.environ.get("RESULT_CACHE_SIZE", 2048)),
+        ttl=float(os.environ.get("RESULT_CACHE_TTL", 60)),
+    )
+
+# Each worker has its own cache. With RESULT_CACHE_INVALIDATION_PATH set (a SQLite
+# file on the machine), /cache/invalidate on one worker reaches the others within
+# RESULT_CACHE_INVALIDATION_POLL seconds; without it, the TTL is the only bound.
+invalidation_log = None
+if result_cache is not None and os.environ.get("RESULT_CACHE_INVALIDATION_PATH"):
+    invalidation_log = InvalidationLog(
+        os.environ["RESULT_CACHE_INVALIDATION_PATH"],
+        result_cache,
+        poll_seconds=float(os.environ.get("RESULT_CACHE_INVALIDATION_POLL", 1)),
+    )
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+def geohash_cell(lat, lng, precision=GEOHASH_PRECISION):
+    """Geohash of the cell containing (lat, lng), plus the cell's centre point."""
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        rng, coord = (lng_range, lng) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        value <<= 1
+        if coord >= mid:
+            value |= 1
+            rng[0] = mid
+        else:
+            rng[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits, value = 0, 0
+    return "".join(chars), (lat_range[0] + lat_range[1]) / 2, (lng_range[0] + lng_range[1]) / 2
+
+def _locate(lat, lng):
+    """
+    (cell, centre lat, centre lng, pad km); no point in the cell is more than
+    `pad` km from its centre. The cell is None when caching is off.
+    """
+    if result_cache is None:
+        return None, lat, lng, 0.0
+    cell, centre_lat, centre_lng = geohash_cell(float(lat), float(lng))
+    lng_bits = (5 * GEOHASH_PRECISION + 1) // 2
+    half_lat = 90.0 / 2 ** (5 * GEOHASH_PRECISION - lng_bits)
+    half_lng = 180.0 / 2 ** lng_bits
+    pad = max(haversine_km(centre_lat, centre_lng, centre_lat + dy, centre_lng + half_lng) for dy in (-half_lat, half_lat))
+    return cell, centre_lat, centre_lng, pad * 1.001
+
+def _sync_invalidations():
+    if invalidation_log is not None:
+        invalidation_log.poll()
+
+def _cached(key, compute, tags=lambda value: (), ttl=None):
+    if result_cache is None:
+        return compute()
+    _sync_invalidations()
+    return result_cache.get_or_compute(key, compute, tags, ttl)
+
+def _closest(candidates, lat, lng, radius, limit):
+    """The `limit` candidates nearest (lat, lng) and closer than `radius` km, with their distances from there."""
+    hits = []
+    for c in candidates:
+        distance = haversine_km(float(lat), float(lng), c['latitude'], c['longitude'])
+        if distance < radius:
+            hits.append(dict(c, distance=distance))
+    hits.sort(key=lambda c: (c['distance'], c['post_title']))
+    return hits[:limit]
+
+def _widen(centre_lat, centre_lng, pad, nearest, limit, radius):
+    """
+    Everything that can be among the `limit` nearest for some point in the cell,
+    given the `limit` nearest to its centre. A user is at most `pad` km from the
+    centre, so their k-th nearest is within (centre's k-th nearest + pad) of them,
+    and so within + 2 * pad of the centre.
+    """
+    if len(nearest) < limit:
+        return nearest  # already every academy within reach of the cell
+    reach = min(radius, nearest[-1]['distance'] + 2 * pad)
+    return find_nearby_centres(centre_lat, centre_lng, radius=reach * 1.0001, limit=CANDIDATE_LIMIT)
+
+# Upper bound on the candidates kept for one cell.
+CANDIDATE_LIMIT = 10000
+
+def _academy_tags(names, date_str):
+    tags = [("academies",)]
+    for name in names:
+        tags += [("academy", name), ("academy", name, date_str)]
+    return tags
+
+def _nearby_candidates(cell, centre_lat, centre_lng, pad, radius, limit):
+    def compute():
+        reach = radius + pad
+        return _widen(centre_lat, centre_lng, pad, find_nearby_centres(centre_lat, centre_lng, radius=reach, limit=limit), limit, reach)
+
+    return _cached(("find_centres", cell, radius, limit), compute, lambda centres: [("academies",)])
+
+def nearby_centres(lat, lng, radius, limit):
+    cell, centre_lat, centre_lng, pad = _locate(lat, lng)
+    if cell is None:
+        return find_nearby_centres(lat, lng, radius=radius, limit=limit)
+    return _closest(_nearby_candidates(cell, centre_lat, centre_lng, pad, radius, limit), lat, lng, radius, limit)
+
+# Largest page size a cursor may carry.
+CURSOR_MAX_LIMIT = 100
+
+def encode_cursor(lat, lng, last, limit):
+    """Opaque "more results" token: the search origin, the last academy shown and the page size."""
+    payload = {"o": [lat, lng], "d": last['distance'], "n": last['post_title'], "l": limit}
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    """(lat, lng, (distance, name), limit); raises ValueError for a malformed cursor."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        lat, lng = (float(v) for v in payload["o"])
+        limit = int(payload["l"])
+        if not 0 < limit <= CURSOR_MAX_LIMIT:
+            raise ValueError(f"page size {limit} out of range")
+        return lat, lng, (float(payload["d"]), str(payload["n"])), limit
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+
+def nearest_page(lat, lng, limit, cursor=None, max_radius=None):
+    """
+    (centres, next_cursor) for the `limit` nearest academies, widening the search
+    as far as needed. Pass next_cursor back to get the following page; it is None
+    once there are no more academies. Pages continue from the cursor's origin and
+    with its page size, so they stay consistent even if the caller's location has
+    moved a little; `limit` only applies to the first page.
+    """
+    if cursor:
+        lat, lng, after, limit = decode_cursor(cursor)
+        centres = _cached(
+            ("nearest", None, lat, lng, limit, after, max_radius),
+            lambda: find_nearest_centres(lat, lng, limit, after, max_radius),
+            lambda centres: [("academies",)],
+        )
+    else:
+        cell, centre_lat, centre_lng, pad = _locate(lat, lng)
+        if cell is None:
+            centres = find_nearest_centres(lat, lng, limit, None, max_radius)
+        else:
+            reach = max_radius + pad if max_radius else math.inf
+
+            def compute():
+                nearest = find_nearest_centres(centre_lat, centre_lng, limit, None, max_radius and reach)
+                return _widen(centre_lat, centre_lng, pad, nearest, limit, reach)
+
+            candidates = _cached(("nearest", cell, limit, max_radius), compute, lambda centres: [("academies",)])
+            centres = _closest(candidates, lat, lng, max_radius or math.inf, limit)
+    next_cursor = encode_cursor(lat, lng, centres[-1], limit) if len(centres) >= limit else None
+    return centres, next_cursor
+
+def nearby_availability(lat, lng, radius, limit, date_str):
+    """
+    (centres, {name: DayGrid}) for the academies near a point on one date.
+    Past-slot filtering for today happens in the caller, so results stay valid all day.
+    """
+    # Both lookups are cached: the cell's candidates, and each academy's grid for the date.
+    centres = nearby_centres(lat, lng, radius, limit)
+    return centres, academy_day_grids([c['post_title'] for c in centres], date_str)
+
+def academy_day_grid(academy_name, date_str):
+    return _cached(
+        ("academy_slots", academy_name, date_str),
+        lambda: get_day_grid(academy_name, date_str),
+        lambda grid: _academy_tags([academy_name], date_str),
+    )
+
+def academy_day_grids(academy_names, date_str):
+    """
+    {name: DayGrid} for several academies, reusing per-academy cache entries and
+    loading only the missing ones, with a single query.
+    """
+    _sync_invalidations()
+    grids, missing = {}, []
+    for name in dict.fromkeys(academy_names):
+        cached = result_cache.get(("academy_slots", name, date_str)) if result_cache else None
+        if cached is None:
+            missing.append(name)
+        else:
+            grids[name] = cached
+    if missing:
+        for name, grid in get_day_grids(missing, date_str).items():
+            grids[name] = grid
+            if result_cache is not None:
+                result_cache.set(("academy_slots", name, date_str), grid, _academy_tags([name], date_str))
+    return grids
+
+def academy_range_grids(academy_names, start_date_str, days):
+    """
+    {name: [DayGrid per day]} for `days` days from start_date_str. Shares the
+    per-day cache entries with academy_day_grids; academies missing any day are
+    loaded together with one range query.
+    """
+    first_day = datetime.strptime(start_date_str, "%Y-%m-%d")
+    dates = [(first_day + timedelta(days=d)).strftime("%Y-%m-%d") for d in range(days)]
+    _sync_invalidations()
+    grids, missing = {}, []
+    for name in dict.fromkeys(academy_names):
+        cached = [result_cache.get(("academy_slots", name, d)) for d in dates] if result_cache else [None]
+        if any(grid is None for grid in cached):
+            missing.append(name)
+        else:
+            grids[name] = cached
+    if missing:
+        for name, day_grids in get_range_grids(missing, start_date_str, days).items():
+            grids[name] = day_grids
+            if result_cache is not None:
+                for date_str, grid in zip(dates, day_grids):
+                    result_cache.set(("academy_slots", name, date_str), grid, _academy_tags([name], date_str))
+    return grids
+
+# --- NEXT AVAILABLE ---
+# Days searched for "next available" questions that don't say how far ahead to look.
+NEXT_AVAILABLE_DAYS = int(os.environ.get("NEXT_AVAILABLE_DAYS", 7))
+# Longest range a next-available search covers, and how many of the nearest
+# academies a "near me" one considers.
+NEXT_AVAILABLE_MAX_DAYS = int(os.environ.get("NEXT_AVAILABLE_MAX_DAYS", 31))
+NEXT_AVAILABLE_CENTRES = int(os.environ.get("NEXT_AVAILABLE_CENTRES", 10))
+
+def next_openings(centres, start_date_str, days, limit=5, time_from=None, time_to=None, now=None):
+    """
+    Earliest free slots at `centres` over `days` days from start_date_str, soonest
+    first and nearest first at the same time, optionally only inside a daily
+    [time_from, time_to) window. Returns [{"post_title", "address", "distance",
+    "start", "display"}]; later days are not examined once `limit` are found.
+    """
+    now = now or datetime.now()
+    grids = academy_range_grids([c['post_title'] for c in centres], start_date_str, days)
+    openings = []
+    for d in range(days):
+        day_openings = []
+        for c in centres:
+            grid = grids[c['post_title']][d]
+            if time_from or time_to:
+                grid = grid.between(time_from, time_to)
+            if grid.day <= now:
+                grid = grid.after(now)
+            # Only the first `limit` slots of one academy can make the cut.
+            for slot in grid.free_slots()[:limit]:
+                day_openings.append((slot['raw_start'], c.get('distance') or 0.0, c['post_title'], slot, c))
+        day_openings.sort(key=lambda o: o[:3])
+        openings.extend(day_openings)
+        if len(openings) >= limit:
+            break
+    return [
+        {"post_title": name, "address": c.get('address'), "distance": c.get('distance'),
+         "start": start, "display": slot['display']}
+        for start, _, name, slot, c in openings[:limit]
+    ]
+
+def academy_count():
+    return _cached(("count_academies",), get_total_academy_count, lambda count: [("academies",)])
+
+def invalidate_academy(academy_name, date_str=None):
+    """
+    Drop cached results that include this academy (on one date, or on any date).
+    Call it whenever a booking for the academy is created, moved or cancelled.
+    """
+    if result_cache is None:
+        return 0
+    tag = ("academy", academy_name, date_str) if date_str else ("academy", academy_name)
+    if invalidation_log is not None:
+        invalidation_log.publish(tag)
+    return result_cache.invalidate_tag(tag)
+
+def invalidate_all():
+    if invalidation_log is not None:
+        invalidation_log.publish()
+    if result_cache is not None:
+        result_cache.clear()
+
+def result_cache_stats():
+    return result_cache.stats() if result_cache else {"enabled": False}
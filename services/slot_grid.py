@@ -0,0 +1,111 @@
+import math
+from datetime import datetime, timedelta
+
+def parse_clock(value):
+    """'06:00' -> 360 minutes after midnight. '24:00' is allowed for closing time."""
+    if isinstance(value, int):
+        return value
+    hours, minutes = str(value).split(":")[:2]
+    return int(hours) * 60 + int(minutes)
+
+class DayGrid:
+    """
+    One academy's day as an integer bitmask: bit i is set when slot i is booked.
+    Slot i covers [open + i * slot_minutes, open + (i + 1) * slot_minutes).
+    """
+    def __init__(self, day, open_time="06:00", close_time="24:00", slot_minutes=60):
+        self.day = datetime(day.year, day.month, day.day)
+        self.open_minute = parse_clock(open_time)
+        self.close_minute = parse_clock(close_time)
+        self.slot_minutes = slot_minutes
+        self.size = max(0, (self.close_minute - self.open_minute) // slot_minutes)
+        self.full_mask = (1 << self.size) - 1
+        self.booked_mask = 0
+
+    def copy(self):
+        grid = DayGrid.__new__(DayGrid)
+        grid.__dict__.update(self.__dict__)
+        return grid
+
+    def _offset(self, moment):
+        # Fractional slot position of a datetime relative to opening time.
+        minutes = (moment - self.day).total_seconds() / 60
+        return (minutes - self.open_minute) / self.slot_minutes
+
+    def _mark(self, lo, hi):
+        lo, hi = max(0, lo), min(self.size, hi)
+        if hi > lo:
+            self.booked_mask |= ((1 << (hi - lo)) - 1) << lo
+
+    def book(self, start, end):
+        """Block every slot that overlaps [start, end)."""
+        self._mark(math.floor(self._offset(start)), math.ceil(self._offset(end)))
+
+    def after(self, moment):
+        """Copy of the grid where slots starting at or before `moment` are unavailable."""
+        grid = self.copy()
+        grid._mark(0, math.floor(grid._offset(moment)) + 1)
+        return grid
+
+    def between(self, start_time=None, end_time=None):
+        """Copy of the grid where only slots lying entirely inside [start_time, end_time) stay free."""
+        grid = self.copy()
+        if start_time:
+            grid._mark(0, math.ceil((parse_clock(start_time) - grid.open_minute) / grid.slot_minutes))
+        if end_time:
+            grid._mark(math.floor((parse_clock(end_time) - grid.open_minute) / grid.slot_minutes), grid.size)
+        return grid
+
+    @property
+    def free_mask(self):
+        return self.full_mask & ~self.booked_mask
+
+    def free_count(self):
+        return bin(self.free_mask).count("1")
+
+    def has_free(self):
+        return self.free_mask != 0
+
+    def is_entirely_free(self):
+        return self.size > 0 and self.free_mask == self.full_mask
+
+    def slot_start(self, i):
+        return self.day + timedelta(minutes=self.open_minute + i * self.slot_minutes)
+
+    def _slot(self, i):
+        start = self.slot_start(i)
+        return {"raw_start": start, "display": start.strftime("%I:%M %p")}
+
+    def free_slots(self):
+        mask = self.free_mask
+        slots = []
+        while mask:
+            low_bit = mask & -mask
+            slots.append(self._slot(low_bit.bit_length() - 1))
+            mask ^= low_bit
+        return slots
+
+    def slot_at(self, moment):
+        """The free slot containing `moment`, or None if it is booked or outside opening hours."""
+        i = math.floor(self._offset(moment))
+        if 0 <= i < self.size and self.free_mask >> i & 1:
+            return self._slot(i)
+        return None
+
+    def free_ranges(self):
+        """Contiguous free runs as (start, end) datetimes."""
+        mask = self.free_mask
+        ranges = []
+        while mask:
+            lo = (mask & -mask).bit_length() - 1
+            shifted = mask >> lo
+            length = ((shifted ^ (shifted + 1)) >> 1).bit_length()
+            ranges.append((self.slot_start(lo), self.slot_start(lo + length)))
+            mask &= ~(((1 << length) - 1) << lo)
+        return ranges
+
+    def format_ranges(self):
+        ranges = self.free_ranges()
+        if not ranges:
+            return "No slots"
+        return ", ".join(f"{start.strftime('%I:%M %p')} - {end.strftime('%I:%M %p')}" for start, end in ranges)
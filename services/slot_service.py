@@ -1,56 +1,101 @@
+import os
+import json
 from datetime import datetime, timedelta
 from db_config import get_db_connection
+from metrics import timed
+from services.slot_grid import DayGrid
+
+# Standard opening hours (06:00 to 23:59) and hourly slots, unless configured otherwise.
+DEFAULT_HOURS = ("06:00", "24:00")
+SLOT_MINUTES = int(os.environ.get("SLOT_MINUTES", 60))
+
+def _load_academy_hours():
+    # Optional JSON file: {"Academy Name": ["07:00", "22:00"], ...}
+    path = os.environ.get("ACADEMY_HOURS_FILE")
+    if not path:
+        return {}
+    with open(path) as f:
+        return {name: tuple(hours) for name, hours in json.load(f).items()}
+
+ACADEMY_HOURS = _load_academy_hours()
 
 def is_overlapping(start_A, end_A, start_B, end_B):
     return start_A < end_B and end_A > start_B
 
+def _as_datetime(value):
+    # Handle string vs datetime objects safely
+    return value if isinstance(value, datetime) else datetime.strptime(str(value), "%Y-%m-%d %H:%M:%S")
+
 def get_available_slots(academy_name, date_str):
     """
-    Checks the 'academy_master' table for existing bookings to calculate free slots.
+    Checks the 'bookings' table for existing bookings to calculate free slots.
     """
+    return get_available_slots_bulk([academy_name], date_str)[academy_name]
+
+def get_available_slots_bulk(academy_names, date_str):
+    """
+    Free slots for several academies on one date, using a single query.
+    Returns {academy_name: [slot, ...]} with an entry for every requested name.
+    """
+    return {name: grid.free_slots() for name, grid in get_day_grids(academy_names, date_str).items()}
+
+def get_day_grid(academy_name, date_str):
+    return get_day_grids([academy_name], date_str)[academy_name]
+
+@timed("get_day_grids")
+def get_day_grids(academy_names, date_str, slot_minutes=None):
+    """
+    Bookings for several academies on one date, rasterised into a DayGrid each.
+    """
+    return {name: days[0] for name, days in _load_grids(academy_names, date_str, 1, slot_minutes).items()}
+
+@timed("get_range_grids")
+def get_range_grids(academy_names, start_date_str, days, slot_minutes=None):
+    """
+    {academy_name: [DayGrid, ...]} for `days` consecutive days from start_date_str,
+    from a single range scan over bookings.
+    """
+    return _load_grids(academy_names, start_date_str, days, slot_minutes)
+
+def _load_grids(academy_names, start_date_str, days, slot_minutes=None):
+    names = list(dict.fromkeys(academy_names))
+    slot_minutes = slot_minutes or SLOT_MINUTES
+    first_day = datetime.strptime(start_date_str, "%Y-%m-%d")
+    grids = {}
+    for name in names:
+        open_time, close_time = ACADEMY_HOURS.get(name, DEFAULT_HOURS)
+        grids[name] = [DayGrid(first_day + timedelta(days=d), open_time, close_time, slot_minutes) for d in range(days)]
+    if not names or days < 1:
+        return grids
+
     conn = get_db_connection()
-    bookings = []
-    
     try:
         with conn.cursor(dictionary=True) as cursor:
-            # Check for bookings matching the Name and Date
-            # We use academy_name because IDs might vary in the master table
-            query = """
-            SELECT slot_start, slot_end
-            FROM academy_master
-            WHERE academy_name = %s
-              AND DATE(slot_start) = %s
+            # Check for bookings matching the Names and Dates.
+            # A half-open range on slot_start (not DATE(slot_start)) lets MySQL use
+            # the (academy_id, slot_start) index on bookings.
+            placeholders = ", ".join(["%s"] * len(names))
+            query = f"""
+            SELECT a.academy_name, b.slot_start, b.slot_end
+            FROM academies a
+            JOIN bookings b ON b.academy_id = a.id
+            WHERE a.academy_name IN ({placeholders})
+              AND b.slot_start >= %s
+              AND b.slot_start < %s
             """
-            cursor.execute(query, (academy_name, date_str))
-            bookings = cursor.fetchall()
-            
+            cursor.execute(query, (*names, first_day, first_day + timedelta(days=days)))
+            # MySQL compares names case-insensitively, so match rows back the same way.
+            by_key = {name.strip().lower(): name for name in names}
+            for b in cursor.fetchall():
+                name = by_key.get(str(b['academy_name']).strip().lower())
+                if name is None:
+                    continue
+                start, end = _as_datetime(b['slot_start']), _as_datetime(b['slot_end'])
+                # A booking past midnight also blocks the start of the next day.
+                first = (start - first_day).days
+                last = min(days - 1, (end - timedelta(microseconds=1) - first_day).days)
+                for d in range(max(0, first), last + 1):
+                    grids[name][d].book(start, end)
     finally:
         conn.close()
-
-    # --- Standard Logic to Calculate Free Slots (06:00 to 23:59) ---
-    available_slots = []
-    current_date_obj = datetime.strptime(date_str, "%Y-%m-%d")
-    
-    # Check 18 hours: 6 AM to 11 PM
-    for hour in range(6, 24): 
-        slot_start = current_date_obj.replace(hour=hour, minute=0, second=0)
-        slot_end = slot_start + timedelta(hours=1)
-        
-        is_blocked = False
-        
-        for b in bookings:
-            # Handle string vs datetime objects safely
-            b_start = b['slot_start'] if isinstance(b['slot_start'], datetime) else datetime.strptime(str(b['slot_start']), "%Y-%m-%d %H:%M:%S")
-            b_end = b['slot_end'] if isinstance(b['slot_end'], datetime) else datetime.strptime(str(b['slot_end']), "%Y-%m-%d %H:%M:%S")
-            
-            if is_overlapping(slot_start, slot_end, b_start, b_end):
-                is_blocked = True
-                break 
-        
-        if not is_blocked:
-            available_slots.append({
-                "raw_start": slot_start,
-                "display": slot_start.strftime("%I:%M %p")
-            })
-            
-    return available_slots
\ No newline at end of file
+    return grids
@@ -1,7 +1,11 @@
 import streamlit as st
 import os
+import time
+from collections import deque
 from datetime import datetime, timedelta
 
+_rerun_started = time.perf_counter()
+
 # --- CRASH-PROOF IMPORT ---
 try:
     from streamlit_js_eval import get_geolocation
@@ -9,30 +13,69 @@ try:
 except ImportError:
     GPS_AVAILABLE = False
 
-from services.center_service import find_nearby_centres, find_centre_by_name, get_total_academy_count
-from services.slot_service import get_available_slots
+from services.center_service import find_centre_by_name
+from services.search_service import nearby_centres, nearest_page, academy_day_grid, academy_day_grids, next_openings, academy_count, NEXT_AVAILABLE_DAYS, NEXT_AVAILABLE_MAX_DAYS, NEXT_AVAILABLE_CENTRES
+from services.slot_grid import DayGrid
+from services.academy_index import get_academy_index
+from metrics import timed, record_stage
+from db_config import get_pool
 
-from llm_handler import get_intent_and_entities
+from llm_handler import get_intent_and_entities, warm_up_client
+from llm_cache import normalise_message
 
 # --- SECRET BRIDGE ---
-if "env" in st.secrets:
-    for key, value in st.secrets["env"].items():
-        os.environ[key] = str(value)
+# Streamlit reruns this script on every interaction; the secrets only need
+# copying into the environment once per process.
+@st.cache_resource
+def bridge_secrets():
+    if "env" in st.secrets:
+        for key, value in st.secrets["env"].items():
+            os.environ[key] = str(value)
+    return True
+
+bridge_secrets()
+
+# --- SHARED RESOURCES ---
+# Opened once per process and shared by every session and rerun: the DB pool,
+# the Groq client and the academy index. A failed step is not fatal (and not
+# retried here); the services still retry on first use.
+@st.cache_resource(show_spinner="Warming up...")
+def warm_shared_resources():
+    status = {}
+    for name, step in (("db_pool", lambda: get_pool().acquire().close()),
+                       ("llm_client", warm_up_client),
+                       ("academy_index", get_academy_index)):
+        try:
+            step()
+            status[name] = "ready"
+        except Exception as e:
+            status[name] = f"failed: {e}"
+    return status
 
 st.set_page_config(page_title="TIDA Sports", page_icon="🎾", layout="centered")
+warm_shared_resources()
 
 # --- SESSION STATE ---
 if "user_lat" not in st.session_state:
     st.session_state.user_lat = 30.7570  # Default: Chandigarh
 if "user_lng" not in st.session_state:
     st.session_state.user_lng = 76.7800
+if "more_cursor" not in st.session_state:
+    st.session_state.more_cursor = None  # set while the last academy list has more pages
+if "reply_memo" not in st.session_state:
+    st.session_state.reply_memo = {}  # see remember_reply()
+    st.session_state.memo_stats = {"hits": 0, "misses": 0}
+if "rerun_ms" not in st.session_state:
+    st.session_state.rerun_ms = deque(maxlen=50)
 if "messages" not in st.session_state:
     st.session_state.messages = [
         {"role": "assistant", "content": "Hi there! 👋 How can I help you play today?"}
     ]
 
 # --- HELPER: TIME FORMAT ---
+@timed("format_time_ranges")
 def format_time_ranges(slots):
+    if isinstance(slots, DayGrid): return slots.format_ranges()
     if not slots: return "No slots"
     sorted_slots = sorted(slots, key=lambda x: x['raw_start'])
     if not sorted_slots: return ""
@@ -52,6 +95,31 @@ def format_time_ranges(slots):
     ranges.append(f"{range_start.strftime('%I:%M %p')} - {range_end.strftime('%I:%M %p')}")
     return ", ".join(ranges)
 
+# --- STREAMED BROAD SEARCH ---
+def stream_availability(centres, req_date, pretty_date):
+    yield f"### 🗓️ Availability for {pretty_date}\n"
+    any_found = False
+
+    # One bulk query for every academy; only the formatting is streamed.
+    grids = academy_day_grids([c['post_title'] for c in centres], req_date)
+    now = datetime.now()
+    for c in centres:
+        grid = grids[c['post_title']]
+        if req_date == now.strftime("%Y-%m-%d"):
+            grid = grid.after(now)
+
+        if grid.has_free():
+            any_found = True
+            dist = round(c['distance'], 1)
+            if grid.is_entirely_free():
+                yield f"\n\n🟢 **{c['post_title']}** ({dist} km)\n   • Entire day available"
+            else:
+                range_str = format_time_ranges(grid)
+                yield f"\n\n🟡 **{c['post_title']}** ({dist} km)\n   • {range_str}"
+
+    if not any_found:
+        yield f"\n\n⚠️ Fully booked nearby for {pretty_date}."
+
 # --- LOGIC HANDLER ---
 def process_user_message(message, lat, lng, search_radius, user_limit):
     ai_data = get_intent_and_entities(message)
@@ -66,7 +134,7 @@ def process_user_message(message, lat, lng, search_radius, user_limit):
 
     # STATS
     if intent == "count_academies":
-        real_count = get_total_academy_count()
+        real_count = academy_count()
         return f"📊 **System Status**\nActive Academies: **{real_count}**"
 
     # ADDRESS
@@ -79,6 +147,33 @@ def process_user_message(message, lat, lng, search_radius, user_limit):
             return f"📍 **{result['post_title']}**\n{result['address']}"
         return "❌ Academy not found. Try asking for 'academies near me'."
 
+    # NEXT AVAILABLE (over several days)
+    if intent == "next_available":
+        start_date = req_date or datetime.now().strftime("%Y-%m-%d")
+        days = min(max(int(ai_data.get("days") or NEXT_AVAILABLE_DAYS), 1), NEXT_AVAILABLE_MAX_DAYS)
+        if target_name:
+            academy = find_centre_by_name(target_name)
+            if not academy:
+                return f"❌ Academy '**{target_name}**' not found."
+            centres = [academy]
+        else:
+            centres = nearby_centres(lat, lng, search_radius, max(limit, NEXT_AVAILABLE_CENTRES))
+            if not centres:
+                return f"🚫 No academies found within {search_radius}km."
+
+        openings = next_openings(centres, start_date, days, limit, req_time, ai_data.get("end_time"))
+        if not openings:
+            where = f"at **{centres[0]['post_title']}**" if target_name else "nearby"
+            return f"⚠️ No free slots {where} in the next {days} days."
+        if target_name:
+            times = "\n".join(f"   • {o['start'].strftime('%a, %d %b')} at **{o['display']}**" for o in openings)
+            return f"### ⏭️ Next free slots at {openings[0]['post_title']}\n\n{times}"
+        lines = []
+        for o in openings:
+            dist = f" ({round(o['distance'], 1)} km)" if o['distance'] is not None else ""
+            lines.append(f"✅ **{o['post_title']}**{dist}\n   • {o['start'].strftime('%a, %d %b')} at **{o['display']}**")
+        return "### ⏭️ Next available slots\n\n" + "\n\n".join(lines)
+
     # CHECK SLOTS
     if intent == "check_slots" or req_date or "slot" in message.lower():
         if not req_date:
@@ -91,55 +186,36 @@ def process_user_message(message, lat, lng, search_radius, user_limit):
             if not academy:
                 return f"❌ Academy '**{target_name}**' not found."
             
-            free_slots = get_available_slots(academy['post_title'], req_date)
+            grid = academy_day_grid(academy['post_title'], req_date)
             now = datetime.now()
             if req_date == now.strftime("%Y-%m-%d"):
-                free_slots = [s for s in free_slots if s['raw_start'] > now]
+                grid = grid.after(now)
 
-            if not free_slots:
+            if not grid.has_free():
                 return f"❌ **{academy['post_title']}** is fully booked on {pretty_date}."
 
             if req_time:
                 req_dt = datetime.strptime(f"{req_date} {req_time}", "%Y-%m-%d %H:%M")
-                match = next((s for s in free_slots if s['raw_start'].hour == req_dt.hour), None)
+                match = grid.slot_at(req_dt)
                 if match:
                     return f"✅ **Available**\n{academy['post_title']} has a slot at **{match['display']}**."
                 else:
                     return f"❌ **Booked**\n{req_time} is taken at {academy['post_title']}."
             else:
-                 time_str = format_time_ranges(free_slots)
+                 time_str = format_time_ranges(grid)
                  return f"✅ **{academy['post_title']}**\n**Open:** {time_str}"
 
         else:
             # BROAD SEARCH
-            centres = find_nearby_centres(lat, lng, radius=search_radius, limit=limit)
+            centres = nearby_centres(lat, lng, search_radius, limit)
             if not centres:
                 return f"🚫 No academies found within {search_radius}km."
 
-            report_blocks = [f"### 🗓️ Availability for {pretty_date}\n"]
-            any_found = False
-
-            for c in centres:
-                free_slots = get_available_slots(c['post_title'], req_date)
-                now = datetime.now()
-                if req_date == now.strftime("%Y-%m-%d"):
-                    free_slots = [s for s in free_slots if s['raw_start'] > now]
-
-                if free_slots:
-                    any_found = True
-                    dist = round(c['distance'], 1)
-                    if len(free_slots) >= 18:
-                        report_blocks.append(f"🟢 **{c['post_title']}** ({dist} km)\n   • Entire day available")
-                    else:
-                        range_str = format_time_ranges(free_slots)
-                        report_blocks.append(f"🟡 **{c['post_title']}** ({dist} km)\n   • {range_str}")
-
-            if not any_found:
-                 return f"⚠️ Fully booked nearby for {pretty_date}."
-            return "\n\n".join(report_blocks)
-
-    # DISCOVERY
-    centres = find_nearby_centres(lat, lng, radius=search_radius, limit=limit)
+            # Streamed: ask_bot renders each block as soon as its bookings are loaded
+            return stream_availability(centres, req_date, pretty_date)
+
+    # DISCOVERY (nearest first, widening up to the radius; "More results" pages on)
+    centres, st.session_state.more_cursor = nearest_page(lat, lng, limit, max_radius=search_radius)
     if not centres:
         return f"No academies found within {search_radius}km."
     
@@ -147,6 +223,42 @@ def process_user_message(message, lat, lng, search_radius, user_limit):
     list_items = [f"📍 **{c['post_title']}**\n   {c['address']} ({round(c['distance'], 1)} km)" for c in centres]
     return header + "\n\n".join(list_items)
 
+def more_results(cursor, search_radius):
+    # Same page size as the list the cursor continues.
+    centres, st.session_state.more_cursor = nearest_page(None, None, None, cursor, max_radius=search_radius)
+    if not centres:
+        return "That's every academy within your search radius."
+    list_items = [f"📍 **{c['post_title']}**\n   {c['address']} ({round(c['distance'], 1)} km)" for c in centres]
+    return f"Here are **{len(centres)}** more academies:\n\n" + "\n\n".join(list_items)
+
+# --- SESSION REPLY MEMO ---
+# Asking the same thing again from the same place (or re-clicking a button) is
+# answered from this session's memo instead of the LLM and database. Entries
+# expire after UI_MEMO_TTL seconds so availability answers don't go stale.
+UI_MEMO_TTL = float(os.environ.get("UI_MEMO_TTL", 60))
+UI_MEMO_SIZE = int(os.environ.get("UI_MEMO_SIZE", 50))
+
+def memo_key(message, lat, lng, search_radius, user_limit):
+    return (normalise_message(message), round(float(lat), 4), round(float(lng), 4), search_radius, user_limit)
+
+def recall_reply(key):
+    """(reply text, more_cursor) or None."""
+    memo = st.session_state.reply_memo
+    entry = memo.get(key)
+    if entry is None or entry[0] < time.monotonic():
+        memo.pop(key, None)
+        st.session_state.memo_stats["misses"] += 1
+        return None
+    st.session_state.memo_stats["hits"] += 1
+    return entry[1], entry[2]
+
+def remember_reply(key, reply, more_cursor):
+    memo = st.session_state.reply_memo
+    memo.pop(key, None)
+    memo[key] = (time.monotonic() + UI_MEMO_TTL, reply, more_cursor)
+    while len(memo) > UI_MEMO_SIZE:
+        memo.pop(next(iter(memo)))  # dicts keep insertion order: drop the oldest
+
 # --- SIDEBAR CONTROL PANEL ---
 with st.sidebar:
     st.header("⚙️ Settings")
@@ -181,26 +293,43 @@ for msg in st.session_state.messages:
     with st.chat_message(msg["role"]):
         st.markdown(msg["content"])
 
-def ask_bot(prompt):
+def ask_bot(prompt, cursor=None):
     st.session_state.messages.append({"role": "user", "content": prompt})
     with st.chat_message("user"):
         st.markdown(prompt)
     
+    # Any new question ends the previous list's "More results".
+    st.session_state.more_cursor = None
     with st.chat_message("assistant"):
         with st.spinner("Thinking..."):
             try:
-                # Pass both settings to the function
-                reply = process_user_message(
-                    prompt, 
-                    st.session_state.user_lat, 
-                    st.session_state.user_lng, 
-                    search_radius, 
-                    result_limit
-                )
-                st.markdown(reply)
+                key = memo_key(prompt, st.session_state.user_lat, st.session_state.user_lng, search_radius, result_limit)
+                memo = None if cursor else recall_reply(key)
+                if memo:
+                    reply, st.session_state.more_cursor = memo
+                elif cursor:
+                    reply = more_results(cursor, search_radius)
+                else:
+                    # Pass both settings to the function
+                    reply = process_user_message(
+                        prompt, 
+                        st.session_state.user_lat, 
+                        st.session_state.user_lng, 
+                        search_radius, 
+                        result_limit
+                    )
+                if isinstance(reply, str):
+                    st.markdown(reply)
+                else:
+                    # Streamed replies are memoised as the text they rendered to.
+                    reply = st.write_stream(reply)
+                if not memo and not cursor:
+                    remember_reply(key, reply, st.session_state.more_cursor)
                 st.session_state.messages.append({"role": "assistant", "content": reply})
             except Exception as e:
                 st.error(f"Error: {e}")
+    if st.session_state.more_cursor:
+        st.rerun()  # so the "More results" button shows under this reply
 
 # --- BUTTONS ---
 st.write("") 
@@ -211,6 +340,21 @@ if cols[1].button("📍 Academies Near Me"):
     ask_bot("Find academies near me")
 if cols[2].button("📊 Stats"):
     ask_bot("How many academies total?")
+if st.session_state.more_cursor and st.button("➕ More results"):
+    ask_bot("More results", cursor=st.session_state.more_cursor)
 
 if user_input := st.chat_input("Type your question..."):
-    ask_bot(user_input)
\ No newline at end of file
+    ask_bot(user_input)
+
+# --- RERUN TIMING ---
+# How long this script run took (interaction to rendered page, minus network),
+# also exported as the "ui_rerun" stage in metrics.
+rerun_seconds = time.perf_counter() - _rerun_started
+record_stage("ui_rerun", rerun_seconds)
+st.session_state.rerun_ms.append(rerun_seconds * 1000)
+with st.sidebar.expander("⏱️ Performance"):
+    recent = sorted(st.session_state.rerun_ms)
+    st.caption(
+        f"This rerun: {rerun_seconds * 1000:.1f} ms · median of last {len(recent)}: {recent[len(recent) // 2]:.1f} ms\n\n"
+        f"Reply memo: {st.session_state.memo_stats['hits']} hits, {st.session_state.memo_stats['misses']} misses"
+    )